@@ -1,15 +1,9 @@
 import os
 import re
-import requests
-import arxiv
 import sys
 import csv
 from datetime import datetime
-
-def download_pdf(url, filepath):
-    response = requests.get(url)
-    with open(filepath, "wb") as f:
-        f.write(response.content)
+from arxiv_api import make_client, get_paper, download_pdf, pdf_filename
 
 def add_to_links_file(title, arxiv_url):
     line = f'{title} | {arxiv_url}'
@@ -54,15 +48,14 @@ def add_to_csv_file(title, arxiv_url, published_date):
 def process_arxiv_url(arxiv_url):
     # Extract the arXiv ID from the URL
     arxiv_id = re.sub(r'v\d+$', '', arxiv_url.split('/')[-1])
-    search = arxiv.Search(id_list=[arxiv_id])
-    paper = next(arxiv.Client().results(search))
+    paper = get_paper(make_client(), arxiv_id)
 
     # Create a valid filename from the paper title
-    safe_title = re.sub(r'[<>:"/\\|?*]', ' -', paper.title)  # Replace invalid filename characters
-    filename = f"{safe_title}.pdf"
+    filename = pdf_filename(paper.title)
+    safe_title = filename[:-4]
     filepath = os.path.join("pdfs", filename)
 
-    # Download the PDF
+    # Download the PDF (or link it from the pdf store if we've downloaded this version before)
     download_pdf(paper.pdf_url, filepath)
     print(f"Downloaded: {filepath}")
 
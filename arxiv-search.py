@@ -1,174 +1,114 @@
-import arxiv
-import time
-from datetime import datetime, timedelta
-import textwrap
-import tkinter as tk
-from tkinter import ttk
-import requests
+from datetime import datetime
 from threading import Thread, Event
-from config import restrict_to_most_recent, max_results, categories
+from config import restrict_to_most_recent, max_results, triage_search_results
+from dedup import load_index, split_arxiv_id
+from profiles import load_profiles, shared_query, fan_out
+from arxiv_api import make_client, paged_results, download_pdf, pdf_filename
+from instrument import span
 import os
 import re
 import csv
 
+# arxiv and tkinter get imported inside main() and show_papers() so importing this file doesn't start a search
 
-if not os.path.exists("pdfs"):
-    os.makedirs("pdfs")
 
-# Python function to read words from a text file and store each line as a string in a list.
-def read_lines_from_file(filename):
+def search_papers(profiles, results, seen_index):
     """
-    Read lines from a text file and store them as strings in a list.
-    
-    Parameters:
-    - filename (str): The name of the text file to read from.
-    
-    Returns:
-    - List[str]: A list containing each line from the text file as a string.
+    Walks the shared result stream until every profile has hit its most recent day searched.
+    Returns the papers to show and the publish date of the newest result
     """
-    lines = []
+    # we can stop paging once every profile has hit its most recent day searched
+    most_recent_check = min(profile.watermark for profile in profiles)
+
+    papers = []
+    with span('arxiv_search') as search_span:
+        i = 0
+        new_most_recent = None
+        for result in results:
+
+            if new_most_recent is None:
+                new_most_recent = result.published.date()#.strftime('%Y-%m-%d')
+
+            for profile in profiles:
+                if restrict_to_most_recent and not profile.reached_watermark and result.published.date() <= profile.watermark:
+                    print(f"[{profile.name}] GOT TO MOST RECENT DATE RESET: {result.published.date()} <= {profile.watermark}")
+                    # Write new_most_recent to .txt file
+                    # we only want to do that here bc if restrict_to_most_recent=False then we don't want to change the value
+                    profile.reached_watermark = True
+                    profile.write_watermark(new_most_recent)
+
+                    # In case you need to run it back
+                    print(f"If you need to run back the most recent check, then edit the date in {profile.watermark_file} to be '{profile.watermark.strftime('%Y-%m-%d')}'.")
+
+            if restrict_to_most_recent & (result.published.date() <= most_recent_check):
+                # bc we've hit files we likely already downloaded for every profile we'll end here
+                break
+
+            matched_profiles = fan_out(result, profiles, restrict_to_most_recent)
+            if not matched_profiles:
+                continue
+
+            duplicates = seen_index.query(result.title, result.entry_id)
+            papers.append({"i": i, "id": split_arxiv_id(result.entry_id)[0], "title": result.title, "abstract": result.summary, "url": result.pdf_url, "published_date": result.published.date(), "duplicates": duplicates, "profiles": matched_profiles})
+            print(f'{result.title}\nPublish date: {result.published.date()}, PDF URL: {result.pdf_url}')
+            if len(profiles) > 1:
+                print(f"Profiles: {', '.join(p.name for p in matched_profiles)}")
+            for key, dup_title, similarity, reason in duplicates:
+                print(f'Possible {reason} of already seen paper {key} ({similarity:.2f}): {dup_title}')
+            #print(result.categories)
+            #print('Abstract: ', textwrap.fill(result.summary, width=220))
+            #print('DOI ', result.doi)
+            print()
+
+            # no sleeping here anymore, paged_results waits on the shared arxiv_api rate limit between pages
+            i += 1
+
+        search_span.add('results', i)
+    print(f"Total papers: {i}")
+    return papers, new_most_recent
+
+def triage_papers(papers):
+    """Adds a 'triage' entry (one-line TL;DR, relevance, tags, see triage.py) to every paper that got one"""
+    from triage import triage
+    from newsletter import make_client as make_openai_client
     try:
-        with open(filename, 'r') as file:
-            for line in file:
-                lines.append(line.strip())  # Remove leading/trailing whitespace
-    except FileNotFoundError:
-        print("File not found: {filename}.")
+        results = triage(make_openai_client(), papers)
     except Exception as e:
-        print(f"An error occurred: {e}")
-    
-    return lines
-
-
-
-# Most Recent Days Checker. Sometimes arxiv posts papers w multiple dates on one day so we really just want to make sure we're checking whatever came out since we last queried
-with open('most_recent_day_searched.txt', 'r') as file:
-    most_recent = file.read()
-print(f'most recent day searched: {most_recent}')
-try:
-    most_recent_check = datetime.strptime(most_recent, '%Y-%m-%d').date()
-except ValueError:
-    most_recent_check = datetime.now().date() - timedelta(days=2)
-
-    with open('most_recent_day_searched.txt', 'w') as file:
-            file.write(most_recent_check.strftime('%Y-%m-%d'))
-
-    print("No date listed in most_recent_day_searched.txt. Two days ago's date inserted, but arXiv frequently publishes papers with older dates on a given day (yes it's confusing) so you may want to edit the text file to an even earlier date. If today is a weekend then the script may return nothing.")
-
-
-
-# search terms
-include_terms = read_lines_from_file("search_terms_include.txt")
-exclude_terms = read_lines_from_file("search_terms_exclude.txt")
-
-include, exclude = 'all:"', 'all:"'
-for term in include_terms: 
-    include += term + '" OR all:"'
-for term in exclude_terms: 
-    exclude += term + '" OR all:"'
-include = include[:-9]
-exclude = exclude[:-9]
-print("\nIncluded Terms:\n", include)
-print("\nExcluded Terms:\n", exclude)
- 
-if len(include_terms) > 0 & len(exclude_terms) > 0:
-    query = f'({categories}) AND ({include}) ANDNOT ({exclude})'
-elif len(include_terms) > 0:
-    query = f'({categories}) AND ({include})'
-elif len(exclude_terms) > 0:
-    query = f'({categories}) ANDNOT ({exclude})'
-else:
-    query = categories
-print("\nQuery:\n", query)
-
-
-client = arxiv.Client(
-  page_size = 1,
-  delay_seconds = 5.0,
-  num_retries = 50
-)
-# Define the search parameters
-search = arxiv.Search(
-    query = query,
-    max_results=max_results,  
-    sort_by=arxiv.SortCriterion.SubmittedDate,  # Sort by submission date
-    sort_order=arxiv.SortOrder.Descending  # In descending order, so the most recent articles come first
-)
-
-results = client.results(search)
-papers = []
-
-
-def safe_iterator(iterable):
-    it = iter(iterable)  # Get an iterator object from the iterable
-    while True:
-        try:
-            yield next(it)  # Yield the next item from the iterator
-        except StopIteration:
-            print("got to StopIteration")
-            break  # StopIteration means there are no more items
-        except Exception as e:
-            # Handle the exception or simply pass to skip to the next item
-            pass
-
-
-i = 0
-for result in safe_iterator(results):
-
-    if i == 0:
-        new_most_recent = result.published.date()#.strftime('%Y-%m-%d')
-    
-    if restrict_to_most_recent & (result.published.date() <= most_recent_check):
-        print(f"GOT TO MOST RECENT DATE RESET: {result.published.date()} <= {most_recent_check}")
-        # Write new_most_recent to .txt file
-        # we only want to do that here bc if restrict_to_most_recent=False then we don't want to change the value
-        with open('most_recent_day_searched.txt', 'w') as file:
-            file.write(new_most_recent.strftime('%Y-%m-%d'))
-
-        # In case you need to run it back
-        print(f"If you need to run back the most recent check, then edit the date in most_recent_day_searched.txt to be '{most_recent_check.strftime('%Y-%m-%d')}'.")
-
-        # bc we've hit files we likely already downloaded before we'll end here
-        break
-    
-    try:
-        papers.append({"i": i, "title": result.title, "url": result.pdf_url, "published_date": result.published.date()})
-        print(f'{result.title}\nPublish date: {result.published.date()}, PDF URL: {result.pdf_url}')
-        #print(result.categories)
-        #print('Abstract: ', textwrap.fill(result.summary, width=220))
-        #print('DOI ', result.doi)
-        print()
-    except UnexpectedEmptyPageError:
-        continue
-    
-    #print('\n')
-
-    # Sleep for 5 seconds to avoid overloading the server
-    time.sleep(5)
-    i += 1
-
-print(f"Total papers: {i}")
-
-# Initialize CSV files with headers if they don't exist
-csv_file_seen = "papers_seen.csv"
-if not os.path.isfile(csv_file_seen):
-    with open(csv_file_seen, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Title", "ArXiv Link", "Paper Date", "Date Added"])
-csv_file_downloaded = "papers_downloaded.csv"
-if not os.path.isfile(csv_file_downloaded):
-    with open(csv_file_downloaded, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Title", "ArXiv Link", "Paper Date", "Date Added"])
+        # the titles are still worth going through without it
+        print(f"Couldn't triage the abstracts bc Error occurred: \n{e}")
+        return
+    for paper in papers:
+        paper['triage'] = results.get(paper['id'])
+        if paper['triage']:
+            print(f"{paper['i']}: {triage_label(paper['triage'])}{paper['title']}\n    {paper['triage']['tldr']}")
+
+def triage_label(entry):
+    relevance = f"[{entry['relevance']}] " if entry.get('relevance') else ''
+    tags = f"({', '.join(entry['tags'])}) " if entry.get('tags') else ''
+    return relevance + tags
+
+def record_seen(papers):
+    # Write to each matching profile's seen CSV
+    today_date = datetime.now().strftime('%Y-%m-%d')
+    for paper in papers:
+        arxiv_id = re.sub(r'v\d+$', '', paper['url'].split('/')[-1])
+        arxiv_url = f"https://arxiv.org/abs/{arxiv_id}"
+        for profile in paper['profiles']:
+            with open(profile.seen_csv, mode='a', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow([pdf_filename(paper['title'])[:-4], arxiv_url, paper['published_date'], today_date])
 
 
 # Function to download PDF from arXiv
-def download_pdf(url, filename, event):
-    response = requests.get(url)
-    with open(filename, "wb") as f:
-        f.write(response.content)
+def download_pdf_thread(url, filename, event):
+    try:
+        download_pdf(url, filename)
+    except Exception as e:
+        print(f"Couldn't download {filename} bc Error occurred: \n{e}")
     event.set()
 
-def on_button_click(url, filename):
+def on_button_click(root, button, url, filename, paper_profiles, paper_date):
+    import tkinter as tk
     arxiv_id = re.sub(r'v\d+$', '', url.split('/')[-1])
     arxiv_url = f"https://arxiv.org/abs/{arxiv_id}"
     #arxiv_id_no_version = arxiv_id.split('v')[0]
@@ -188,16 +128,17 @@ def on_button_click(url, filename):
     # Write the title & URL to a text file
     with open('links.txt', 'a') as file:
         file.write(line + '\n')
-    
-    # Write to papers_downloaded.csv
+
+    # Write to papers_downloaded.csv (or whichever downloaded csv each matching profile uses)
     today_date = datetime.now().strftime('%Y-%m-%d')
-    with open(csv_file_downloaded, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([filename[5:-4], arxiv_url, new_most_recent, today_date])
+    for profile in paper_profiles:
+        with open(profile.downloaded_csv, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow([filename[5:-4], arxiv_url, paper_date, today_date])
 
     # Download the PDF in a new thread
     event = Event()
-    thread = Thread(target=download_pdf, args=(url, filename, event))
+    thread = Thread(target=download_pdf_thread, args=(url, filename, event))
     thread.daemon = True  # Ensure the thread exits when the main program exits
     thread.start()
 
@@ -210,45 +151,84 @@ def on_button_click(url, filename):
     button.config(state=tk.DISABLED)
     check_thread()
 
-# Create the main window
-root = tk.Tk()
-root.title("arXiv Paper Downloader")
-
-# Create a canvas and a vertical scrollbar
-canvas = tk.Canvas(root)
-scrollbar = ttk.Scrollbar(root, orient="vertical", command=canvas.yview)
-frame = ttk.Frame(canvas)
-
-# Configure canvas and add the frame to it
-canvas.create_window((0, 0), window=frame, anchor="nw")
-canvas.configure(yscrollcommand=scrollbar.set)
-
-today_date = datetime.now().strftime('%Y-%m-%d')
-for i, paper in enumerate(papers):
-    # Write to CSV
-    arxiv_id = re.sub(r'v\d+$', '', paper['url'].split('/')[-1])
-    arxiv_url = f"https://arxiv.org/abs/{arxiv_id}"
-    with open(csv_file_seen, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([paper['title'].replace(":", " -"), arxiv_url, paper['published_date'], today_date])
-
-    button = ttk.Button(
-        frame, 
-        text=f"{paper['i']}: {paper['title']}", 
-        command=lambda url=paper['url'], 
-        fn=f"pdfs/{paper['title']}.pdf".replace(":", " -"): on_button_click(url, fn))
-    button.grid(row=i, column=1)
-
-# Update frame size and set canvas scroll region
-frame.update_idletasks()
-canvas.config(scrollregion=canvas.bbox("all"))
-
-# Place canvas and scrollbar in the GUI
-canvas.grid(row=0, column=0, sticky="nsew")
-scrollbar.grid(row=0, column=1, sticky="ns")
-
-# Enable resizing
-root.grid_rowconfigure(0, weight=1)
-root.grid_columnconfigure(0, weight=1)
-
-root.mainloop()
\ No newline at end of file
+def show_papers(papers, profiles, paper_date):
+    import tkinter as tk
+    from tkinter import ttk
+
+    # Create the main window
+    root = tk.Tk()
+    root.title("arXiv Paper Downloader")
+
+    # Create a canvas and a vertical scrollbar
+    canvas = tk.Canvas(root)
+    scrollbar = ttk.Scrollbar(root, orient="vertical", command=canvas.yview)
+    frame = ttk.Frame(canvas)
+
+    # Configure canvas and add the frame to it
+    canvas.create_window((0, 0), window=frame, anchor="nw")
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    for i, paper in enumerate(papers):
+        profile_tags = f"[{', '.join(p.name for p in paper['profiles'])}] " if len(profiles) > 1 else ''
+        button = ttk.Button(
+            frame,
+            text=f"{paper['i']}: {profile_tags}{'[SEEN?] ' if paper['duplicates'] else ''}{paper['title']}")
+        # the command gets its own button so the right one is disabled while its pdf downloads
+        button.config(command=lambda button=button, url=paper['url'],
+            fn=f"pdfs/{pdf_filename(paper['title'])}",
+            paper_profiles=paper['profiles']: on_button_click(root, button, url, fn, paper_profiles, paper_date))
+        button.grid(row=i, column=1)
+        if paper.get('triage'):
+            ttk.Label(frame, text=f"{triage_label(paper['triage'])}{paper['triage']['tldr']}", wraplength=600).grid(row=i, column=2, sticky="w", padx=5)
+
+    # Update frame size and set canvas scroll region
+    frame.update_idletasks()
+    canvas.config(scrollregion=canvas.bbox("all"))
+
+    # Place canvas and scrollbar in the GUI
+    canvas.grid(row=0, column=0, sticky="nsew")
+    scrollbar.grid(row=0, column=1, sticky="ns")
+
+    # Enable resizing
+    root.grid_rowconfigure(0, weight=1)
+    root.grid_columnconfigure(0, weight=1)
+
+    root.mainloop()
+
+def main():
+    import arxiv
+
+    if not os.path.exists("pdfs"):
+        os.makedirs("pdfs")
+
+    # Every profile in config.py gets evaluated over this one fetch, so extra profiles cost CPU, not API time
+    profiles = load_profiles()
+    for profile in profiles:
+        profile.init_csvs()
+        print(f"\n[{profile.name}] Included Terms:\n", profile.include_terms)
+        print(f"[{profile.name}] Excluded Terms:\n", profile.exclude_terms)
+
+    query = shared_query(profiles)
+    print("\nQuery:\n", query)
+
+    client = make_client()
+    # Define the search parameters
+    search = arxiv.Search(
+        query = query,
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion.SubmittedDate,  # Sort by submission date
+        sort_order=arxiv.SortOrder.Descending  # In descending order, so the most recent articles come first
+    )
+
+    # MinHash index over everything in papers_seen.csv so resubmissions & retitled papers get flagged as they stream in
+    with span('dedup_load'):
+        seen_index = load_index([profile.seen_csv for profile in profiles])
+
+    papers, new_most_recent = search_papers(profiles, paged_results(client, search), seen_index)
+    record_seen(papers)
+    if triage_search_results and papers:
+        triage_papers(papers)
+    show_papers(papers, profiles, new_most_recent)
+
+if __name__ == "__main__":
+    main()
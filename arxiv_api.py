@@ -0,0 +1,72 @@
+import re
+import itertools
+from config import page_size, empty_page_retries, arxiv_api_url
+from ratelimit import call_with_retry
+from instrument import span
+
+# arxiv and requests get imported inside the functions that use them, they're most of a script's startup time
+
+def make_client():
+    import arxiv
+    # pacing and retries are handled by ratelimit.py, so the arxiv library shouldn't sleep or retry on its own
+    client = arxiv.Client(page_size=page_size, delay_seconds=0, num_retries=0)
+    client.query_url_format = arxiv_api_url
+    return client
+
+def _fetch_page(client, search, offset):
+    # islice stops right at the end of the page so the arxiv generator never requests the next one
+    return list(itertools.islice(client.results(search, offset=offset), client.page_size))
+
+def _page(client, search, offset):
+    with span('arxiv_page') as s:
+        page = call_with_retry('arxiv_api', _fetch_page, client, search, offset)
+        s.add('results', len(page))
+    return page
+
+def paged_results(client, search):
+    """
+    Yields search results one page (one request) at a time through the shared rate limiter.
+    arXiv sometimes hands back an empty page in the middle of a result set, so an empty page
+    only counts as the end once it has come back empty a few times in a row.
+    """
+    offset = 0
+    while search.max_results is None or offset < search.max_results:
+        page = _page(client, search, offset)
+        retries = 0
+        while not page and offset > 0 and retries < empty_page_retries:
+            retries += 1
+            page = _page(client, search, offset)
+        if not page:
+            return
+        yield from page
+        offset += len(page)
+
+def get_paper(client, arxiv_id):
+    import arxiv
+    search = arxiv.Search(id_list=[arxiv_id])
+    with span('arxiv_lookup'):
+        return call_with_retry('arxiv_api', lambda: next(client.results(search)))
+
+def _get(url):
+    import requests
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    return response.content
+
+def pdf_filename(title):
+    # the one place titles turn into filenames, so pdfs/, links.txt and the csvs always agree on the name
+    return re.sub(r'[<>:"/\\|?*]', ' -', ' '.join(title.split())) + '.pdf'
+
+def download_pdf(url, filepath, store=None):
+    """
+    Puts the pdf at filepath, linked from the pdf store. Only goes to arXiv if the store doesn't
+    have that paper version yet. Returns the size in bytes
+    """
+    from pdfstore import PdfStore
+    store = store or PdfStore()
+    with span('pdf_download') as s:
+        size, hit = store.fetch(url, filepath, lambda url: call_with_retry('arxiv_pdf', _get, url))
+        s.add('bytes', size)
+        if hit:
+            s.add('cache_hits')
+    return size
@@ -0,0 +1,74 @@
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from bench.server import FakeHandler, serve
+from bench.synthetic_pdf import make_pdf, pages_for
+
+FEED_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" xmlns:arxiv="http://arxiv.org/schemas/atom">
+  <title type="html">ArXiv Query: fake</title>
+  <id>http://arxiv.org/api/fake</id>
+  <updated>2024-01-01T00:00:00-05:00</updated>
+  <opensearch:totalResults>{total}</opensearch:totalResults>
+  <opensearch:startIndex>{start}</opensearch:startIndex>
+  <opensearch:itemsPerPage>{per_page}</opensearch:itemsPerPage>
+"""
+
+ENTRY = """  <entry>
+    <id>http://arxiv.org/abs/{id}</id>
+    <updated>{published}T00:00:00Z</updated>
+    <published>{published}T00:00:00Z</published>
+    <title>{title}</title>
+    <summary>{abstract}</summary>
+    <author><name>Ada Lovelace</name></author>
+    <link href="http://arxiv.org/abs/{id}" rel="alternate" type="text/html"/>
+    <link title="pdf" href="{base}/pdf/{id}" rel="related" type="application/pdf"/>
+    <arxiv:primary_category term="{primary}" scheme="http://arxiv.org/schemas/atom"/>
+{categories}  </entry>
+"""
+
+class ArxivHandler(FakeHandler):
+    """
+    Stand-in for export.arxiv.org: /api/query pages through the records newest first (query
+    terms are ignored, it's the paging & parsing cost we're after) and /pdf/<id> serves a
+    synthetic pdf whose size depends on the paper.
+    """
+    records = []
+    by_id = {}
+    pdf_cache = {}
+
+    def do_GET(self):
+        if self.throttle_or_wait():
+            return
+        url = urlparse(self.path)
+        if url.path.startswith('/pdf/'):
+            return self.send_pdf(url.path[len('/pdf/'):])
+        params = parse_qs(url.query)
+        if params.get('id_list', [''])[0]:
+            ids = params['id_list'][0].split(',')
+            records = [self.by_id[i.split('v')[0]] for i in ids if i.split('v')[0] in self.by_id]
+            start = 0
+        else:
+            start = int(params.get('start', ['0'])[0])
+            per_page = int(params.get('max_results', ['10'])[0])
+            records = self.records[start:start + per_page]
+        base = f"http://{self.headers.get('Host')}"
+        body = FEED_HEADER.format(total=len(self.records), start=start, per_page=len(records))
+        for r in records:
+            categories = ''.join(f'    <category term="{c}" scheme="http://arxiv.org/schemas/atom"/>\n' for c in r['categories'])
+            body += ENTRY.format(id=r['id'], published=r['published'], title=escape(r['title']), abstract=escape(r['abstract']),
+                                 base=base, primary=r['categories'][0], categories=categories)
+        body += "</feed>\n"
+        self.send(200, body.encode('utf-8'), 'application/atom+xml')
+
+    def send_pdf(self, arxiv_id):
+        arxiv_id = arxiv_id.replace('.pdf', '')
+        if arxiv_id not in self.pdf_cache:
+            record = self.by_id.get(arxiv_id.split('v')[0], {'title': arxiv_id})
+            self.pdf_cache[arxiv_id] = make_pdf(record['title'], pages=pages_for(len(self.pdf_cache)), seed=len(self.pdf_cache))
+        self.send(200, self.pdf_cache[arxiv_id], 'application/pdf')
+
+def start(records, latency=0.05, rate=None, burst=1):
+    """Serves the replayed records. Returns (server, api url format for config.arxiv_api_url, base url)"""
+    by_id = {r['id'].split('v')[0]: r for r in records}
+    server, base = serve(ArxivHandler, latency=latency, rate=rate, burst=burst, records=records, by_id=by_id, pdf_cache={})
+    return server, base + '/api/query?{}', base
@@ -0,0 +1,55 @@
+import re
+import json
+import time
+from bench.server import FakeHandler, serve
+
+# one silent MPEG-1 layer III frame (128kbps, 44.1kHz). A few hundred of them decode as a short silent mp3
+_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+class OpenAIHandler(FakeHandler):
+    """
+    Stand-in for api.openai.com: /v1/chat/completions answers with a canned summary built from the
+    prompt (or, for triage.py's json requests, a TL;DR per [id] in the batch), and /v1/audio/speech
+    returns silent mp3 audio roughly as long as the text would be.
+    """
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.throttle_or_wait():
+            return
+        if self.path.endswith('/chat/completions'):
+            return self.chat(request)
+        if self.path.endswith('/audio/speech'):
+            frames = max(1, len(request.get('input', '')) // 15)
+            return self.send(200, _MP3_FRAME * frames, 'audio/mpeg')
+        self.send(404, b'{"error": "not found"}', 'application/json')
+
+    def chat(self, request):
+        prompt_characters = sum(len(m.get('content') or '') for m in request.get('messages', []))
+        if (request.get('response_format') or {}).get('type') == 'json_object':
+            content = self.triage(request['messages'][-1].get('content') or '')
+        else:
+            words = ' '.join((request['messages'][0].get('content') or '').split()[:60])
+            content = f"This paper studies {words}."
+        body = {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o-mini'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_characters // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': prompt_characters // 4 + len(content) // 4},
+        }
+        self.send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+    def triage(self, batch):
+        papers = []
+        for paper_id, title in re.findall(r'^\[(\w+)\] (.*)$', batch, re.MULTILINE):
+            papers.append({'id': paper_id, 'tldr': f"Proposes {' '.join(title.split()[:12])}.",
+                           'relevance': ('high', 'medium', 'low')[len(title) % 3], 'tags': ['fake', 'bench']})
+        return json.dumps({'papers': papers})
+
+def start(latency=0.2, rate=None, burst=1):
+    """Returns (server, base url for config.openai_base_url)"""
+    server, base = serve(OpenAIHandler, latency=latency, rate=rate, burst=burst)
+    return server, base + '/v1'
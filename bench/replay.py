@@ -0,0 +1,43 @@
+import csv
+import random
+from bench.synthetic_pdf import WORDS
+
+CATEGORIES = ['cs.AI', 'cs.LG', 'cs.CL', 'stat.ML', 'cs.MA', 'cs.CV', 'cs.RO']
+
+def load_history(csv_file='papers_seen.csv', limit=None):
+    """
+    The real papers_seen.csv history turned into fake arXiv records (newest first like the API sorts them).
+    Titles, ids and dates are real; abstracts and categories are made up but deterministic.
+    """
+    records = []
+    with open(csv_file, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            if len(row) < 3 or '/abs/' not in row[1] and '/pdf/' not in row[1]:
+                continue
+            arxiv_id = row[1].rstrip('/').split('/')[-1]
+            rng = random.Random(arxiv_id)
+            records.append({
+                'id': arxiv_id if 'v' in arxiv_id else arxiv_id + 'v1',
+                'title': row[0],
+                'published': row[2],
+                'abstract': f"{row[0]}. " + ' '.join(rng.choice(WORDS) for _ in range(150)),
+                'categories': rng.sample(CATEGORIES, 2),
+            })
+    records.sort(key=lambda r: r['published'], reverse=True)
+    return records[:limit] if limit else records
+
+def write_ledger(csv_file, rows):
+    with open(csv_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Title", "ArXiv Link", "Paper Date", "Date Added"])
+        writer.writerows(rows)
+
+def copy_ledger(source, destination, limit=None):
+    with open(source, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        rows = [row for row in reader if row]
+    write_ledger(destination, rows[:limit] if limit else rows)
+    return rows[:limit] if limit else rows
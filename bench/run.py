@@ -0,0 +1,355 @@
+import os
+import csv
+import sys
+import json
+import time
+import random
+import itertools
+import shutil
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+from bench import fake_arxiv, fake_openai
+from bench.replay import load_history, write_ledger, copy_ledger
+from bench.synthetic_pdf import make_pdf, pages_for, paper_lines
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(REPO, 'bench', 'baseline.json')
+RESULT_PREFIX = 'BENCH_RESULT '
+
+# stage -> the third party packages it needs. Stages whose packages aren't installed get reported as skipped
+STAGES = {
+    'search': ['arxiv'],
+    'download': ['arxiv', 'requests'],
+    'extract': ['PyPDF2'],
+    'summarize': ['openai'],
+    'triage': ['openai'],
+    'cleanup': [],
+    'trim': [],
+    'dedup': [],
+    'startup': [],
+    'stats': ['numpy'],
+}
+
+# lightweight commands should be done before this, process startup included
+STARTUP_TARGET_MS = 100
+
+### the stages themselves. These run inside a child process whose working directory is a sandbox
+### with its own config.py, so each one gets its own peak RSS and can't touch the real files
+
+def stage_search(args):
+    """arxiv-search.py minus the GUI: page through the feed, fan out to profiles, flag duplicates"""
+    import arxiv
+    from arxiv_api import make_client, paged_results
+    from profiles import load_profiles, fan_out
+    from dedup import load_index
+    profiles = load_profiles()
+    index = load_index([p.seen_csv for p in profiles])
+    search = arxiv.Search(query='cat:cs.AI', max_results=args.papers, sort_by=arxiv.SortCriterion.SubmittedDate)
+    n, flagged = 0, 0
+    for result in paged_results(make_client(), search):
+        if fan_out(result, profiles, restrict_to_most_recent=False):
+            flagged += bool(index.query(result.title, result.entry_id))
+        n += 1
+    return n, {'flagged_duplicates': flagged}
+
+def stage_download(args):
+    """Downloads --pdfs papers into pdfs/, then fetches them all again, which should be all pdf store hits"""
+    import arxiv
+    from arxiv_api import make_client, paged_results, download_pdf
+    search = arxiv.Search(query='cat:cs.AI', max_results=args.pdfs)
+    total_bytes = 0
+    os.makedirs('pdfs', exist_ok=True)
+    os.makedirs('pdfs-again', exist_ok=True)
+    urls = []
+    for i, result in enumerate(paged_results(make_client(), search)):
+        total_bytes += download_pdf(result.pdf_url, os.path.join('pdfs', f'{i}.pdf'))
+        urls.append(result.pdf_url)
+    served = arxiv_pdf_requests()
+    start = time.perf_counter()
+    for i, url in enumerate(urls):
+        download_pdf(url, os.path.join('pdfs-again', f'{i}.pdf'))
+    return args.pdfs, {'bytes': total_bytes, 'refetch_seconds': round(time.perf_counter() - start, 4),
+                       'refetch_downloads': arxiv_pdf_requests() - served}
+
+def arxiv_pdf_requests():
+    import ratelimit
+    return ratelimit.counters.get('arxiv_pdf', {}).get('requests', 0)
+
+def stage_extract(args):
+    from newsletter import extract_text
+    pdfs = sorted(os.listdir('pdfs-to-summarize'))
+    characters = sum(len(extract_text(os.path.join('pdfs-to-summarize', f)) or '') for f in pdfs)
+    return len(pdfs), {'characters': characters}
+
+def stage_summarize(args):
+    """newsletter-podcast.py's loop: summaries written as sections while the SpeechWorker does TTS alongside"""
+    from newsletter import make_client, summarize, Manifest, SpeechWorker, section_header
+    client = make_client()
+    ids = [f'paper-{i}' for i in range(args.pdfs)]
+    manifest = Manifest('newsletter-sections')
+    manifest.set_order([(i, i) for i in ids])
+    speech = SpeechWorker(client, manifest)
+    for i, section_id in enumerate(ids):
+        text = '\n'.join(paper_lines(section_id, pages_for(i) * 55, random.Random(i)))
+        manifest.write_section(section_id, f"{section_header(section_id, None)}\n{summarize(client, text, show_spinner=False)}")
+        speech.submit(section_id)
+    errors = speech.finish()
+    return args.pdfs, {'tts_errors': len(errors)}
+
+def stage_triage(args):
+    """arxiv-search.py's triage over --papers abstracts, then the same papers again, which should all come from the cache"""
+    from newsletter import make_client
+    from triage import triage
+    from dedup import split_arxiv_id
+    papers = {}
+    for record in load_history('papers_seen.csv', limit=args.papers):
+        arxiv_id = split_arxiv_id(record['id'])[0]
+        papers[arxiv_id] = {'id': arxiv_id, 'title': record['title'], 'abstract': record['abstract']}
+    papers = list(papers.values())
+    client = make_client()
+    results = triage(client, papers, show_progress=False)
+    requests = openai_chat_requests()
+    triage(client, papers, show_progress=False)
+    return len(papers), {'triaged': len(results), 'requests': requests, 'cached_requests': openai_chat_requests() - requests}
+
+def openai_chat_requests():
+    import ratelimit
+    return ratelimit.counters.get('openai_chat', {}).get('requests', 0)
+
+def stage_cleanup(args):
+    import cleanup
+    n = len(os.listdir('pdfs-to-summarize'))
+    cleanup.main()
+    return n, {}
+
+def stage_trim(args):
+    from timestamp_trimmer import trim_timestamps
+    from config import limit
+    timestamps = [f"{i // 60}:{i % 60:02d} Some Paper Title About Large Language Models Number {i} https://arxiv.org/abs/2406.{i:05d}"
+                  for i in range(0, args.papers // 10 * 7, 7)]
+    trimmed = trim_timestamps(list(timestamps), limit)
+    return len(timestamps), {'kept': len(trimmed)}
+
+def stage_startup(args, runs=15):
+    """
+    `python cli.py trim` end to end in fresh processes: interpreter startup + imports + trimming a week's
+    worth of timestamps (60 papers, a bit over the youtube limit). Fails if the median misses the target
+    """
+    import statistics
+    with open('timestamps.txt', 'w') as f:
+        f.write('\n'.join(f"{i // 60}:{i % 60:02d} Some Paper Title About Large Language Models Number {i} https://arxiv.org/abs/2406.{i:05d}"
+                          for i in range(0, 60 * 40, 40)))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(REPO, 'cli.py'), 'trim', 'timestamps.txt'], check=True, capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    median = statistics.median(times)
+    if median >= STARTUP_TARGET_MS:
+        raise RuntimeError(f"cli.py trim took {median:.1f} ms (median of {runs}), the target is {STARTUP_TARGET_MS} ms")
+    return runs, {'median_ms': round(median, 1), 'max_ms': round(max(times), 1), 'target_ms': STARTUP_TARGET_MS}
+
+def stage_stats(args):
+    """stats.py over papers_seen.csv blown up to --stats-rows rows: the one-time cache build, then a run against the warm cache"""
+    import io
+    import contextlib
+    import stats
+    with open('papers_seen.csv', 'r', newline='') as f:
+        history = [row for row in csv.reader(f)][1:]
+    write_ledger('papers_seen.csv', ([f"{row[0]} {i}", f"https://arxiv.org/abs/{9000 + i // 100000}.{i % 100000:05d}", row[2], row[3]]
+                                     for i, row in zip(range(args.stats_rows), itertools.cycle(history))))
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats.main([])
+        times.append(time.perf_counter() - start)
+    return args.stats_rows, {'cold_seconds': round(times[0], 2), 'warm_ms': round(times[1] * 1000, 1)}
+
+def stage_dedup(args):
+    from dedup import load_index, find_clusters
+    index = load_index(['papers_seen.csv'])
+    clusters = find_clusters('papers_seen.csv')
+    return len(index.entries), {'clusters': len(clusters)}
+
+def run_child(stage, args):
+    start = time.perf_counter()
+    items, extra = globals()[f'stage_{stage}'](args)
+    seconds = time.perf_counter() - start
+    result = {'stage': stage, 'items': items, 'seconds': round(seconds, 4),
+              'items_per_second': round(items / seconds, 2) if seconds else None,
+              'peak_rss_mb': round(peak_rss_mb(), 1), **extra}
+    print(RESULT_PREFIX + json.dumps(result))
+
+def peak_rss_mb():
+    # on linux ru_maxrss carries over the parent's high water mark through fork+exec, VmHWM doesn't
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+### the parent: fakes, sandboxes, baseline comparison
+
+def make_sandbox(args, urls, history):
+    sandbox = tempfile.mkdtemp(prefix='arxiv-bench-')
+    with open(os.path.join(REPO, 'config.py'), 'r') as f:
+        config_text = f.read()
+    config_text += f"""
+
+### benchmark overrides
+arxiv_api_url = {urls['arxiv_api']!r}
+openai_base_url = {urls['openai']!r}
+max_results = {args.papers}
+rate_limits = {{
+    'arxiv_api': {{'rate': {args.arxiv_rate}, 'burst': 2}},
+    'arxiv_pdf': {{'rate': {args.arxiv_rate}, 'burst': 4}},
+    'openai_chat': {{'rate': {args.openai_rate}, 'burst': 10}},
+    'openai_tts': {{'rate': {args.openai_rate}, 'burst': 10}},
+}}
+retry_policy = {{'max_retries': 6, 'base_delay': 0.1, 'max_delay': 2.0}}
+send_to_obsidian = True
+obsidian_vault_location = 'vault'
+obsidian_vault_attachments_location = 'vault/attachments'
+instrumentation = False
+"""
+    with open(os.path.join(sandbox, 'config.py'), 'w') as f:
+        f.write(config_text)
+    for name in ('search_terms_include.txt', 'search_terms_exclude.txt'):
+        shutil.copy(os.path.join(REPO, name), sandbox)
+    with open(os.path.join(sandbox, 'most_recent_day_searched.txt'), 'w') as f:
+        f.write('2000-01-01')
+    with open(os.path.join(sandbox, 'key_openai.txt'), 'w') as f:
+        f.write('sk-fake')
+
+    write_ledger(os.path.join(sandbox, 'papers_seen.csv'),
+                 [[r['title'], f"https://arxiv.org/abs/{r['id']}", r['published'], r['published']] for r in history])
+    downloaded = copy_ledger(os.path.join(REPO, 'papers_downloaded.csv'), os.path.join(sandbox, 'papers_downloaded.csv'))
+    for folder in ('pdfs', 'pdfs-to-summarize', 'vault/attachments'):
+        os.makedirs(os.path.join(sandbox, folder), exist_ok=True)
+    with open(os.path.join(sandbox, 'links.txt'), 'w') as f:
+        for i, row in enumerate(downloaded[:args.pdfs]):
+            f.write(f"{row[0]} | {row[1]}\n")
+            with open(os.path.join(sandbox, 'pdfs-to-summarize', f"{row[0]}.pdf"), 'wb') as pdf:
+                pdf.write(make_pdf(row[0], pages=pages_for(i), seed=i))
+    return sandbox
+
+def run_stage(stage, args, urls, history):
+    missing = [m for m in STAGES[stage] if importlib.util.find_spec(m) is None]
+    if missing:
+        return {'stage': stage, 'skipped': f"missing {', '.join(missing)}"}
+    sandbox = make_sandbox(args, urls, history)
+    try:
+        env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        command = [sys.executable, '-m', 'bench.run', '--child', stage, '--papers', str(args.papers), '--pdfs', str(args.pdfs),
+                   '--stats-rows', str(args.stats_rows)]
+        completed = subprocess.run(command, cwd=sandbox, env=env, capture_output=True, text=True)
+        for line in completed.stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX):])
+        return {'stage': stage, 'failed': (completed.stderr or completed.stdout).strip().splitlines()[-1:] or ['no output']}
+    finally:
+        if args.keep_sandboxes:
+            print(f"kept {sandbox}")
+        else:
+            shutil.rmtree(sandbox, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regression messages: slower or fatter than the baseline by more than the tolerance"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['stage'])
+        if not base or 'seconds' not in result:
+            continue
+        # small absolute floors so scheduler noise on tiny stages doesn't count as a regression
+        for metric, floor in (('seconds', 0.05), ('peak_rss_mb', 5.0)):
+            if result[metric] > base[metric] * (1 + tolerance) and result[metric] - base[metric] > floor:
+                regressions.append(f"{result['stage']}: {metric} {result[metric]} vs baseline {base[metric]} (+{result[metric] / base[metric] - 1:.0%})")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for every stage, against local fakes of arXiv and OpenAI")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"comma separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--papers', type=int, default=2000, help='how many papers_seen.csv rows to replay through the fake arXiv feed')
+    parser.add_argument('--pdfs', type=int, default=12, help='how many synthetic pdfs to download/extract/summarize/clean up')
+    parser.add_argument('--stats-rows', type=int, default=1000000, help='how many rows the stats stage blows papers_seen.csv up to')
+    parser.add_argument('--arxiv-latency', type=float, default=0.05)
+    parser.add_argument('--arxiv-rate', type=float, default=20.0, help='requests/second the fake arXiv allows before answering 429')
+    parser.add_argument('--openai-latency', type=float, default=0.2)
+    parser.add_argument('--openai-rate', type=float, default=20.0)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='how much slower/bigger than the baseline counts as a regression')
+    parser.add_argument('--update-baseline', action='store_true', help=f'save these results as the new {os.path.relpath(BASELINE_FILE, REPO)}')
+    parser.add_argument('--allow-incomplete', action='store_true',
+                        help="don't fail the run over stages skipped for missing packages or measured stages with no baseline")
+    parser.add_argument('--keep-sandboxes', action='store_true')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(args.child, args)
+
+    history = load_history(os.path.join(REPO, 'papers_seen.csv'), limit=args.papers)
+    arxiv_server, arxiv_api_url, _ = fake_arxiv.start(history, latency=args.arxiv_latency, rate=args.arxiv_rate, burst=2)
+    openai_server, openai_url = fake_openai.start(latency=args.openai_latency, rate=args.openai_rate, burst=10)
+    urls = {'arxiv_api': arxiv_api_url, 'openai': openai_url}
+
+    results = []
+    for stage in args.stages.split(','):
+        result = run_stage(stage.strip(), args, urls, history)
+        results.append(result)
+        if 'seconds' in result:
+            extra = ', '.join(f"{k} {v}" for k, v in result.items() if k not in ('stage', 'items', 'seconds', 'items_per_second', 'peak_rss_mb'))
+            print(f"{result['stage']:<10} {result['items']:>7} items {result['seconds']:>9.3f}s {result['items_per_second'] or 0:>10.1f}/s "
+                  f"peak RSS {result['peak_rss_mb']:>7.1f} MB  {extra}")
+        else:
+            print(f"{result['stage']:<10} {result.get('skipped') or 'FAILED: ' + ' '.join(result['failed'])}")
+    print(f"fake arXiv throttled {arxiv_server.RequestHandlerClass.bucket.throttled} requests, fake OpenAI {openai_server.RequestHandlerClass.bucket.throttled}")
+
+    measured = [r for r in results if 'seconds' in r]
+    failed = [r for r in results if 'failed' in r]
+    skipped = [r for r in results if 'skipped' in r]
+    if failed:
+        print(f"\nFAILED: {', '.join(r['stage'] for r in failed)}")
+    # a stage that didn't run can't have regressed, but it can't count as checked either
+    incomplete = bool(skipped) and not args.allow_incomplete
+    if skipped:
+        print(f"\nSkipped (install their packages, or pass --allow-incomplete): {', '.join(r['stage'] for r in skipped)}")
+    if args.update_baseline:
+        baseline = {}
+        if os.path.isfile(BASELINE_FILE):
+            with open(BASELINE_FILE, 'r') as f:
+                baseline = json.load(f)
+        baseline.update({r['stage']: r for r in measured})
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baseline, f, indent=1)
+        print(f"Saved baseline for {len(measured)} stages to {BASELINE_FILE}")
+        sys.exit(1 if failed or incomplete else 0)
+    if not os.path.isfile(BASELINE_FILE):
+        # no baseline means nothing can be checked, which is an error rather than a pass
+        print(f"No baseline at {BASELINE_FILE}, run again with --update-baseline to save one")
+        sys.exit(1)
+    with open(BASELINE_FILE, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(measured, baseline, args.tolerance)
+    missing = [r['stage'] for r in measured if r['stage'] not in baseline]
+    if missing:
+        print(f"\nNot in the baseline yet (run with --update-baseline to add them): {', '.join(missing)}")
+        incomplete = incomplete or not args.allow_incomplete
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions:
+            print(f"  {message}")
+    if regressions or failed or incomplete:
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class Bucket:
+    """Server-side token bucket, so the fakes can throttle us the way the real APIs do"""
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+        self.throttled = 0
+
+    def allow(self):
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.throttled += 1
+            return False
+
+class FakeHandler(BaseHTTPRequestHandler):
+    # set on the subclass made by serve()
+    latency = 0.0
+    bucket = None
+
+    def log_message(self, format, *args):
+        pass  # keep the benchmark output readable
+
+    def throttle_or_wait(self):
+        """Returns True if the request was throttled (and already answered with a 429)"""
+        if self.bucket and not self.bucket.allow():
+            self.send(429, b'{"error": "rate limited"}', 'application/json', {'Retry-After': '1'})
+            return True
+        if self.latency:
+            time.sleep(self.latency)
+        return False
+
+    def send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(handler_class, latency=0.0, rate=None, burst=1, **attrs):
+    """Starts a handler on a random local port in a daemon thread. Returns (server, base url)"""
+    handler = type(handler_class.__name__, (handler_class,), dict(latency=latency, bucket=Bucket(rate, burst), **attrs))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
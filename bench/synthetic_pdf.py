@@ -0,0 +1,53 @@
+import random
+
+WORDS = ("model learning training data language attention transformer layer token loss gradient "
+         "benchmark evaluation reasoning agent policy reward network sparse dense optimization "
+         "inference scaling parameter retrieval context embedding representation alignment").split()
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def paper_lines(title, n_lines, rng):
+    yield title
+    for _ in range(n_lines - 1):
+        yield ' '.join(rng.choice(WORDS) for _ in range(12))
+
+def make_pdf(title, pages=8, lines_per_page=55, seed=0):
+    """
+    Returns the bytes of a plain but valid PDF with real text on every page (Helvetica text
+    operators), so PyPDF2 has actual extraction work to do. Bigger `pages` = bigger paper.
+    """
+    rng = random.Random(seed)
+    lines = list(paper_lines(title, pages * lines_per_page, rng))
+    objects = []  # index i is object number i + 1
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # pages tree, filled in once we know the page object numbers
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_numbers = []
+    for p in range(pages):
+        page_lines = lines[p * lines_per_page:(p + 1) * lines_per_page]
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td\n" + '\n'.join(f"({_escape(line)}) '" for line in page_lines) + "\nET"
+        stream = stream.encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_number = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number)
+        page_numbers.append(len(objects))
+    kids = ' '.join(f"{n} 0 R" for n in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+def pages_for(i, sizes=(2, 8, 20, 40)):
+    """Spread of paper sizes, from a short workshop paper to a long one with appendices"""
+    return sizes[i % len(sizes)]
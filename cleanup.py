@@ -2,14 +2,15 @@ import os
 import shutil
 import glob
 import csv
-from config import obsidian_vault_location, obsidian_vault_attachments_location, frontmatter_lines, send_to_obsidian
+from dedup import DuplicateIndex, split_arxiv_id
+from pdfstore import PdfStore
+from instrument import span
+from config import obsidian_vault_location, obsidian_vault_attachments_location, frontmatter_lines, send_to_obsidian, sections_dir, pipeline_dir
 
 def make_folder_if_none(path):  
     if not os.path.exists(path):
         os.makedirs(path)
 
-make_folder_if_none("pdfs-to-summarize")
-
 def update_papers_kept_csv(base_filename):
     downloaded_csv = "papers_downloaded.csv"
     kept_csv = "papers_kept.csv"
@@ -29,6 +30,21 @@ def update_papers_kept_csv(base_filename):
             if row and row[0] == base_filename:  # Check if row is not empty and matches base_filename
                 row_to_add = row
                 break
+
+    # Fall back to a near-duplicate title match for when the filename got renamed or mangled a little
+    if not row_to_add:
+        index = DuplicateIndex()
+        rows = {}
+        with open(downloaded_csv, mode='r', newline='') as file:
+            reader = csv.reader(file)
+            next(reader)
+            for row in reader:
+                if len(row) >= 2:
+                    rows[index.add(row[0], row[1])] = row
+        matches = index.query(base_filename)
+        if matches:
+            row_to_add = rows[matches[0][0]]
+            print(f"No exact title match for {base_filename}, using closest match: {row_to_add[0]}")
     
     # Add the row to papers_kept.csv
     if row_to_add:
@@ -48,7 +64,8 @@ def get_link(base_filename):
     return None
 
 def process_files(pdf_folder, md_final_folder, pdf_final_folder):
-    
+    store = PdfStore()
+
     # Get all text files in the specified folder
     pdf_files = glob.glob(os.path.join(pdf_folder, '*.pdf'))
 
@@ -74,24 +91,20 @@ def process_files(pdf_folder, md_final_folder, pdf_final_folder):
         except shutil.Error as e:
             print(f"Error: {e}. Skipping file {md_file} because it already exists in the Obsidian Vault.")
 
-        # Move the .pdf files to the final folder. the exception exists cuz sometimes i get antsy and add the pdf too soon
-        try:
-            shutil.move(pdf_file, pdf_final_folder)
-        except shutil.Error as e:
-            print(f"Error: {e}. Skipping file {pdf_file} because it already exists in the Obsidian Vault.")
+        # Link the .pdf into the final folder from the pdf store rather than copying it over. the check exists cuz sometimes i get antsy and add the pdf too soon
+        vault_pdf = os.path.join(pdf_final_folder, os.path.basename(pdf_file))
+        if os.path.exists(vault_pdf):
+            print(f"Error: {vault_pdf} already exists. Skipping file {pdf_file} because it already exists in the Obsidian Vault.")
+        else:
+            arxiv_id, version = split_arxiv_id(link)
+            method = store.place(store.add_file(pdf_file, arxiv_id, version), vault_pdf)
+            print(f"Sent {base_filename}.pdf to the vault ({method})")
 
         # Update papers_kept.csv
         update_papers_kept_csv(base_filename)
 
     print(f'{count} files added to vault assuming no skip errors')
 
-if send_to_obsidian:
-    # Call the function with your specified folders
-    process_files('pdfs-to-summarize', 
-                    obsidian_vault_location,
-                    obsidian_vault_attachments_location)
-
-
 def delete_all_files_in_folder(folder_path):
     for filename in os.listdir(folder_path):
         file_path = os.path.join(folder_path, filename)
@@ -101,41 +114,32 @@ def delete_all_files_in_folder(folder_path):
         except Exception as e:
             print(f"Couldn't delete {filename} file from {folder_path} folder bc Error occurred: \n{e}")
 
-delete_all_files_in_folder("pdfs-to-summarize")
-delete_all_files_in_folder("pdfs")
-
-try:
-    if os.path.isfile('links.txt'):
-        os.remove('links.txt')
-except Exception as e:
-    print(f"Couldn't delete links.txt bc Error occurred: \n{e}")
-
-try:
-    if os.path.isfile('timestamps.txt'):
-        os.remove('timestamps.txt')
-except Exception as e:
-    print(f"Couldn't delete timestamps.txt bc Error occurred: \n{e}")
-
-try:
-    if os.path.isfile('trimmed_timestamps.txt'):
-        os.remove('trimmed_timestamps.txt')
-except Exception as e:
-    print(f"Couldn't delete trimmed_timestamps.txt bc Error occurred: \n{e}")
-
-try:
-    if os.path.isfile('timestamps_adjusted.txt'):
-        os.remove('timestamps_adjusted.txt')
-except Exception as e:
-    print(f"Couldn't delete timestamps_adjusted.txt bc Error occurred: \n{e}")
-
-try:
-    if os.path.isfile('newsletter.txt'):
-        os.remove('newsletter.txt')
-except Exception as e:
-    print(f"Couldn't delete newsletter.txt bc Error occurred: \n{e}")
-
-try:
-    if os.path.isfile('newsletter_podcast.mp3'):
-        os.remove('newsletter_podcast.mp3')
-except Exception as e:
-    print(f"Couldn't delete newsletter_podcast.mp3 bc Error occurred: \n{e}")
\ No newline at end of file
+def delete_generated_files():
+    delete_all_files_in_folder("pdfs-to-summarize")
+    delete_all_files_in_folder("pdfs")
+
+    for path in ['links.txt', 'timestamps.txt', 'trimmed_timestamps.txt', 'timestamps_adjusted.txt', 'newsletter.txt',
+                 sections_dir, 'newsletter_podcast.mp3', pipeline_dir, pipeline_dir + '-dry-run']:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.isfile(path):
+                os.remove(path)
+        except Exception as e:
+            print(f"Couldn't delete {path} bc Error occurred: \n{e}")
+
+def main():
+    make_folder_if_none("pdfs-to-summarize")
+    make_folder_if_none("pdfs")
+
+    if send_to_obsidian:
+        # Call the function with your specified folders
+        with span('cleanup_vault'):
+            process_files('pdfs-to-summarize',
+                            obsidian_vault_location,
+                            obsidian_vault_attachments_location)
+
+    delete_generated_files()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+One entry point for the weekly workflow:
+
+    python cli.py search                  # arxiv-search.py
+    python cli.py fetch <arxiv urls>      # arxiv-link-downloader.py
+    python cli.py summarize               # newsletter-podcast.py --no-audio
+    python cli.py podcast                 # newsletter-podcast.py
+    python cli.py record                  # recording.py
+    python cli.py trim <timestamps file>  # timestamp_trimmer.py
+    python cli.py cleanup                 # cleanup.py
+    python cli.py pipeline [...]          # pipeline.py
+    python cli.py stats [...]             # stats.py
+
+Each command only imports the script it runs (and that script only imports arxiv/openai/PyPDF2/pydub/
+tkinter/pynput once it actually needs them), so something like `trim` starts about as fast as python does.
+The scripts still work on their own too.
+"""
+import sys
+import argparse
+import importlib
+
+def load(script):
+    # most of the scripts have hyphens in their names, so a plain import statement won't do
+    return importlib.import_module(script)
+
+def search(args):
+    load('arxiv-search').main()
+
+def fetch(args):
+    load('arxiv-link-downloader').main(args.arxiv_urls)
+
+def summarize(args):
+    load('newsletter-podcast').main(podcast=False)
+
+def podcast(args):
+    load('newsletter-podcast').main(podcast=True)
+
+def record(args):
+    load('recording').main()
+
+def trim(args):
+    load('timestamp_trimmer').main(args.timestamps_file)
+
+def cleanup(args):
+    load('cleanup').main()
+
+def pipeline(args):
+    load('pipeline').main(args.forwarded_args)
+
+def stats(args):
+    load('stats').main(args.forwarded_args)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find, download, summarize, record and clean up the week's arXiv papers")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('search', help="pick papers from the newest arXiv results in a window").set_defaults(run=search)
+    p = commands.add_parser('fetch', help="download specific arXiv papers and add them to links.txt & the csvs")
+    p.add_argument('arxiv_urls', nargs='+')
+    p.set_defaults(run=fetch)
+    commands.add_parser('summarize', help="summarize pdfs-to-summarize/ into newsletter.txt").set_defaults(run=summarize)
+    commands.add_parser('podcast', help="newsletter.txt plus newsletter_podcast.mp3 (reuses existing summaries)").set_defaults(run=podcast)
+    commands.add_parser('record', help="hotkey timestamps while recording the video").set_defaults(run=record)
+    p = commands.add_parser('trim', help="trim timestamps to fit a youtube description")
+    p.add_argument('timestamps_file')
+    p.set_defaults(run=trim)
+    commands.add_parser('cleanup', help="send kept papers to obsidian and delete the week's files").set_defaults(run=cleanup)
+    # these two parse their own flags (and --help), everything after the command gets passed along
+    commands.add_parser('pipeline', add_help=False, help="download -> extract -> summarize -> TTS as one pipeline (see pipeline --help)").set_defaults(run=pipeline)
+    commands.add_parser('stats', add_help=False, help="papers per day/week, seen -> downloaded -> kept funnel, search term hit rates (see stats --help)").set_defaults(run=stats)
+
+    args, forwarded_args = parser.parse_known_args(argv)
+    if forwarded_args and args.command not in ('pipeline', 'stats'):
+        parser.error(f"unrecognized arguments: {' '.join(forwarded_args)}")
+    args.forwarded_args = forwarded_args
+    args.run(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
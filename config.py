@@ -1,15 +1,109 @@
 ### arxiv-search.py
 restrict_to_most_recent = True
 max_results = 5000
+# results per arXiv API request. pacing between requests is handled by ratelimit.py
+page_size = 100
+# where arXiv API queries go (the benchmarks point this at a local fake server)
+arxiv_api_url = 'https://export.arxiv.org/api/query?{}'
+# arXiv occasionally returns an empty page partway through a search, so retry one a few times before treating it as the end
+empty_page_retries = 2
 categories = "cat:cs.AI OR cat:stat.ML OR cat:cs.CL OR cat:cs.LG OR cat:cs.MA OR cat:cs.MA"
+# Named search profiles, each with its own categories, search term files, most-recent-day file and csv files.
+# All of them get evaluated over one shared arXiv fetch, so adding a profile costs CPU time rather than extra API time.
+# 'default' is the original single-profile setup
+profiles = {
+    'default': {
+        'categories': categories,
+        'include_terms_file': 'search_terms_include.txt',
+        'exclude_terms_file': 'search_terms_exclude.txt',
+        'watermark_file': 'most_recent_day_searched.txt',
+        'seen_csv': 'papers_seen.csv',
+        'downloaded_csv': 'papers_downloaded.csv',
+    },
+    #'robotics': {
+    #    'categories': "cat:cs.RO",
+    #    'include_terms_file': 'search_terms_include_robotics.txt',
+    #    'exclude_terms_file': 'search_terms_exclude_robotics.txt',
+    #    'watermark_file': 'most_recent_day_searched_robotics.txt',
+    #    'seen_csv': 'papers_seen_robotics.csv',
+    #    'downloaded_csv': 'papers_downloaded_robotics.csv',
+    #},
+}
+
+### pdfstore.py
+# every downloaded pdf is kept here once, by content hash, and linked into pdfs/, pdfs-to-summarize/ and the obsidian vault.
+# cleanup.py never deletes it. Hardlinks only work within one drive, so keep it on the same drive as your vault
+pdf_store_dir = 'pdf_store'
+# tried in order until one works. reflinks (APFS clones, btrfs/xfs on linux) are free and safe to edit;
+# with hardlinks, annotating a pdf in the vault changes the stored one too (it then just gets downloaded again if needed)
+pdf_link_modes = ['reflink', 'hardlink', 'copy']
+
+### ratelimit.py
+# token buckets shared by every script running at once: 'rate' is requests per second, 'burst' the most that can go out back to back.
+# arXiv asks for no more than one API request every 3 seconds
+rate_limits = {
+    'arxiv_api': {'rate': 1 / 3, 'burst': 1},
+    'arxiv_pdf': {'rate': 1, 'burst': 4},
+    'openai_chat': {'rate': 5, 'burst': 10},
+    'openai_tts': {'rate': 1, 'burst': 3},
+}
+# jittered exponential backoff for transient errors. A Retry-After header from the server overrides the backoff
+retry_policy = {'max_retries': 6, 'base_delay': 2.0, 'max_delay': 120.0}
+# where the bucket state and throttle/retry counters are shared between scripts (plus a .lock file next to it)
+ratelimit_state_file = '.ratelimit_state.json'
+
+### instrument.py
+# record a timing span (plus bytes/tokens/requests/retries/cache hits) for every stage of every script into runs/<run id>.jsonl.
+# ARXIV_WORKFLOW_TRACE=1 or 0 overrides this for one run. `python instrument.py report` summarizes them
+instrumentation = False
+runs_dir = 'runs'
+
+### dedup.py
+# Jaccard similarity of two titles' character shingles at or above which the papers get flagged as the same paper
+dedup_threshold = 0.8
+# where the MinHash index over papers_seen.csv is persisted between runs
+dedup_index_file = 'dedup_index.pkl'
+
+### stats.py
+# the ledger csvs as memory-mapped numpy columns, only updated with newly appended rows
+stats_cache_dir = 'stats_cache'
+
+### triage.py
+# one-line TL;DRs + relevance & topic tags from the abstracts of everything arxiv-search.py finds, shown next to each title.
+# Costs a little OpenAI money (and needs key_openai.txt) so it's off by default
+triage_search_results = False
+triage_model = 'gpt-4o-mini'
+# what the model should call relevant. Mine's in here as an example
+triage_interests = "new architectures, training methods, reasoning, interpretability, efficiency and scaling of large language models and other deep learning models. Applied papers in specific domains (medicine, robotics hardware, remote sensing, ...) are less interesting"
+# abstracts packed into each request (so 500 papers take 10 requests), with a cap on characters per request so batches of long abstracts still fit
+triage_batch_size = 50
+triage_batch_characters = 80000
+# results cached per arXiv id so a paper only ever gets triaged once. cleanup.py leaves it alone
+triage_cache_file = 'triage_cache.jsonl'
 
 ### generate_newsletter.py 
+# None means OpenAI's own API. The benchmarks point this at a local fake server
+openai_base_url = None
 # Mess around with these prompts to tease out specific information you're looking for
 prompts = [ # don't forget commas if you add more prompts to the list
 "You are an expert scientific researcher speaking to a somewhat technical audience. Please provide clear, concise descriptions and explanations of the core assertions, methodology, results, potential critiques of, and/or implications elucidated herein, if any. Specificity is preferred over broad or vague statements. Be very concise; write dense, meaningful sentences with minimal word fluff. Do not use any kind of text formatting."#,
 #"You are an expert scientific researcher with a wide range of cross-disciplinary background knowledge. List all of the prerequisite knowledge required in order to understand the concepts laid out here. Please answer extremely concisely in a simple bulleted format. Entries should include both individual concepts as well as the names of disciplines and sub-disciplines. Also, please provide a complete citation for this paper to the best of your ability given the information provided. Only include a url if it is listed in the content of the paper." 
 ]
 
+### pipeline.py
+# where the pipeline keeps its per-paper pdfs, text, sections, audio and checkpoint file (dry runs use this + '-dry-run'). Deleted by cleanup.py
+pipeline_dir = 'pipeline'
+# how many papers can sit between two stages before the faster stage waits on the slower one
+pipeline_queue_size = 4
+# threads per stage
+pipeline_workers = {'fetch': 2, 'extract': 2, 'summarize': 4, 'synthesize': 2}
+# seconds each fake download/LLM/TTS call takes in --dry-run mode
+dry_run_latency = 0.2
+
+### newsletter-podcast.py
+# one file per newsletter section (plus its mp3) and a manifest.json with their order. Survives crashes, deleted by cleanup.py
+sections_dir = 'newsletter-sections'
+
 ### cleanup.py
 # Change to False if you don't use obsidian
 send_to_obsidian = True
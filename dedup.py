@@ -0,0 +1,226 @@
+import os
+import re
+import csv
+import sys
+import zlib
+import pickle
+import random
+import argparse
+import unicodedata
+from config import dedup_threshold, dedup_index_file
+
+# Mersenne prime used for the MinHash permutations. Shingles are hashed to 32 bits with crc32
+# so (a * x + b) % _PRIME never overflows into anything slow
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# bumped whenever the pickled layout changes, so an old dedup_index.pkl gets rebuilt instead of misread
+INDEX_VERSION = 2
+
+def normalize_text(text):
+    """
+    Lowercase, strip accents and punctuation, and collapse whitespace so that
+    'Foo: A Bar' (arXiv) and 'Foo - A Bar' (our csv files) look identical.
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = text.encode('ascii', 'ignore').decode('ascii').lower()
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    return text.strip()
+
+def split_arxiv_id(url_or_id):
+    """
+    Returns (arxiv_id_without_version, version) from an arxiv abs/pdf url or a bare id.
+    Version is None if there isn't one (e.g. the links in our csv files).
+    """
+    if not url_or_id:
+        return None, None
+    last = url_or_id.rstrip('/').split('/')[-1]
+    if last.endswith('.pdf'):
+        last = last[:-4]
+    match = re.match(r'^(.*?)(?:v(\d+))?$', last)
+    version = int(match.group(2)) if match.group(2) else None
+    return match.group(1), version
+
+def title_shingles(title, k=4):
+    # character shingles hold up better than word shingles on short strings like titles
+    text = normalize_text(title)
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+class DuplicateIndex:
+    """
+    MinHash signatures + LSH banding over normalized titles. Entries are keyed by arxiv id without the
+    version so resubmissions collide on the key directly, and retitled papers get caught by the LSH buckets.
+    The buckets only propose candidates; whether one counts as a duplicate is decided on the exact Jaccard
+    similarity of the two titles' shingles, since a 32 permutation estimate is easily off by 0.15.
+    Abstracts aren't indexed because the ledgers don't keep them.
+    """
+    def __init__(self, num_perm=32, bands=8, seed=1):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.version = INDEX_VERSION
+        self.entries = {}  # key -> (title, arxiv_id, title_signature)
+        self.buckets = [dict() for _ in range(bands)]
+        self.indexed_rows = {}  # csv path -> number of data rows already added
+
+    def signature(self, shingles):
+        if not shingles:
+            return None
+        hashes = [zlib.crc32(s.encode('utf-8')) & _MAX_HASH for s in shingles]
+        return tuple(min([(a * h + b) % _PRIME for h in hashes]) for a, b in self.perms)
+
+    def _band_keys(self, signature):
+        r = self.rows
+        return [hash(signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def add(self, title, arxiv_url=None, signature=None):
+        arxiv_id, _ = split_arxiv_id(arxiv_url)
+        key = arxiv_id or normalize_text(title)
+        if key in self.entries:
+            return key
+        title_sig = signature or self.signature(title_shingles(title))
+        self.entries[key] = (title, arxiv_id, title_sig)
+        if title_sig is not None:
+            for band, band_key in zip(self.buckets, self._band_keys(title_sig)):
+                band.setdefault(band_key, []).append(key)
+        return key
+
+    def query(self, title, arxiv_url=None, threshold=None, shingles=None, signature=None):
+        """
+        Returns a list of (key, title, similarity, reason) sorted by similarity, where reason is
+        'version' for the same arxiv id and 'near-duplicate' for an LSH candidate whose title
+        shingles have an exact Jaccard similarity of at least threshold.
+        """
+        threshold = dedup_threshold if threshold is None else threshold
+        matches = []
+        arxiv_id, _ = split_arxiv_id(arxiv_url)
+        if arxiv_id and arxiv_id in self.entries:
+            matches.append((arxiv_id, self.entries[arxiv_id][0], 1.0, 'version'))
+
+        shingles = title_shingles(title) if shingles is None else shingles
+        title_sig = signature or self.signature(shingles)
+        if title_sig is None:
+            return matches
+        candidates = set()
+        for band, band_key in zip(self.buckets, self._band_keys(title_sig)):
+            candidates.update(band.get(band_key, ()))
+        candidates.discard(arxiv_id)
+
+        for key in candidates:
+            other_title = self.entries[key][0]
+            similarity = jaccard(shingles, title_shingles(other_title))
+            if similarity >= threshold:
+                matches.append((key, other_title, similarity, 'near-duplicate'))
+        return sorted(matches, key=lambda m: -m[2])
+
+    def add_csv(self, csv_file):
+        """Index any rows of a ledger csv that were appended since the last time we looked at it"""
+        if not os.path.isfile(csv_file):
+            return 0
+        already = self.indexed_rows.get(csv_file, 0)
+        added, n = 0, 0
+        with open(csv_file, mode='r', newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)  # skip the header
+            for n, row in enumerate(reader, start=1):
+                if n <= already or len(row) < 2:
+                    continue
+                self.add(row[0], row[1])
+                added += 1
+        self.indexed_rows[csv_file] = max(n, already)
+        return added
+
+    def save(self, path=None):
+        path = path or dedup_index_file
+        tmp_path = path + '.tmp'
+        # pickle a plain dict rather than the object so the file loads no matter which script saved it
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+def load_index(csv_files=("papers_seen.csv",), path=None):
+    """
+    Loads the persisted index (or starts a fresh one) and indexes whatever got appended to the
+    ledgers since it was last saved. Saves it back if anything changed.
+    """
+    path = path or dedup_index_file
+    index = None
+    if os.path.isfile(path):
+        try:
+            with open(path, 'rb') as f:
+                index = DuplicateIndex.__new__(DuplicateIndex)
+                index.__dict__.update(pickle.load(f))
+            if getattr(index, 'version', None) != INDEX_VERSION:
+                print(f"{path} is from an older version of dedup.py, rebuilding it")
+                index = None
+        except Exception as e:
+            index = None
+            print(f"Couldn't load {path}, rebuilding it bc Error occurred: \n{e}")
+    if index is None:
+        index = DuplicateIndex()
+    added = sum(index.add_csv(csv_file) for csv_file in csv_files)
+    if added:
+        index.save(path)
+    return index
+
+def find_clusters(csv_file, threshold=None):
+    """Returns groups of ledger rows that are the same paper (same arxiv id or near-duplicate titles)"""
+    index = DuplicateIndex()
+    rows = []
+    with open(csv_file, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        rows = [row for row in reader if len(row) >= 2]
+
+    # union-find over row numbers
+    parent = list(range(len(rows)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    first_row_of_key = {}
+    for i, row in enumerate(rows):
+        shingles = title_shingles(row[0])
+        signature = index.signature(shingles)
+        for key, _, _, _ in index.query(row[0], row[1], threshold=threshold, shingles=shingles, signature=signature):
+            parent[find(i)] = find(first_row_of_key[key])
+        key = index.add(row[0], row[1], signature=signature)
+        first_row_of_key.setdefault(key, i)
+
+    clusters = {}
+    for i in range(len(rows)):
+        clusters.setdefault(find(i), []).append(rows[i])
+    return [c for c in clusters.values() if len(c) > 1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate and re-versioned papers in the csv ledgers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help=f'Build/update {dedup_index_file} from the ledgers')
+    build.add_argument('csv_files', nargs='*', default=['papers_seen.csv'])
+    clusters = subparsers.add_parser('clusters', help='Print clusters of duplicate rows in a ledger')
+    clusters.add_argument('csv_file', nargs='?', default='papers_seen.csv')
+    clusters.add_argument('--threshold', type=float, default=None, help=f'Title Jaccard similarity cutoff (default {dedup_threshold})')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        index = load_index(args.csv_files)
+        print(f"{len(index.entries)} papers indexed in {dedup_index_file}")
+    elif args.command == 'clusters':
+        found = find_clusters(args.csv_file, args.threshold)
+        for cluster in found:
+            print()
+            for row in cluster:
+                print(f"{row[1]} | {row[0]}")
+        print(f"\n{len(found)} duplicate clusters found in {args.csv_file}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
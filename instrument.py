@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import threading
+from config import instrumentation, runs_dir
+
+# ARXIV_WORKFLOW_TRACE=1 (or 0) overrides the config setting for a single run
+enabled = os.environ.get('ARXIV_WORKFLOW_TRACE', '1' if instrumentation else '0') not in ('', '0', 'false', 'False')
+run_id = f"{time.strftime('%Y-%m-%d_%H-%M-%S')}_{os.getpid()}"
+script = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+class _NoopSpan:
+    """What span() hands back when instrumentation is off, so the only cost is a function call"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, name, n=1):
+        pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    """
+    Times one stage (one page, one download, one LLM call...) and collects counters like bytes,
+    tokens, requests, retries and cache hits. Written as one json line to runs/<run id>.jsonl on exit.
+    """
+    def __init__(self, stage, **attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.counters = {}
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._t0
+        _local.stack.pop()
+        record = {'run': run_id, 'script': script, 'stage': self.stage, 'start': round(self.start, 3),
+                  'seconds': round(duration, 6), 'counters': self.counters}
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        _write(record)
+        return False
+
+def _write(record):
+    line = json.dumps(record, default=str) + '\n'
+    with _write_lock:
+        os.makedirs(runs_dir, exist_ok=True)
+        with open(os.path.join(runs_dir, f'{run_id}.jsonl'), 'a') as f:
+            f.write(line)
+
+def span(stage, **attrs):
+    if not enabled:
+        return _NOOP
+    return Span(stage, **attrs)
+
+def add(name, n=1):
+    """Adds to a counter on the innermost span open in this thread (if any)"""
+    if not enabled:
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        stack[-1].add(name, n)
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+def load_spans(last=None):
+    import glob
+    paths = sorted(glob.glob(os.path.join(runs_dir, '*.jsonl')))
+    if last:
+        paths = paths[-last:]
+    spans = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # a run that got killed mid-write
+    return spans, len(paths)
+
+def report(spans):
+    """Per stage: how many, p50/p95/total seconds, and counter totals + per-second throughput"""
+    by_stage = {}
+    for s in spans:
+        by_stage.setdefault(s['stage'], []).append(s)
+    rows = []
+    for stage, stage_spans in sorted(by_stage.items()):
+        seconds = [s['seconds'] for s in stage_spans]
+        total = sum(seconds)
+        counters = {}
+        for s in stage_spans:
+            for name, n in s.get('counters', {}).items():
+                counters[name] = counters.get(name, 0) + n
+        rows.append({
+            'stage': stage,
+            'count': len(stage_spans),
+            'errors': sum(1 for s in stage_spans if 'error' in s),
+            'p50': percentile(seconds, 50),
+            'p95': percentile(seconds, 95),
+            'total': total,
+            'counters': counters,
+            'per_second': {name: n / total for name, n in counters.items()} if total else {},
+        })
+    return rows
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarize the per-stage timing spans recorded in runs/")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help='p50/p95 latency and throughput per stage across runs')
+    report_parser.add_argument('--last', type=int, default=None, help='only look at the most recent N runs')
+    args = parser.parse_args(argv)
+
+    spans, n_runs = load_spans(args.last)
+    if not spans:
+        print(f"No spans in {runs_dir}/ yet. Set instrumentation = True in config.py or run with ARXIV_WORKFLOW_TRACE=1")
+        return
+    print(f"{len(spans)} spans from {n_runs} runs\n")
+    print(f"{'stage':<24}{'count':>7}{'errors':>8}{'p50 s':>10}{'p95 s':>10}{'total s':>10}  throughput")
+    for row in report(spans):
+        throughput = ', '.join(f"{name} {n:,.0f} ({row['per_second'].get(name, 0):,.1f}/s)" for name, n in sorted(row['counters'].items()))
+        print(f"{row['stage']:<24}{row['count']:>7}{row['errors']:>8}{row['p50']:>10.3f}{row['p95']:>10.3f}{row['total']:>10.1f}  {throughput}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
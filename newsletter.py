@@ -0,0 +1,218 @@
+import os
+import json
+import queue
+import threading
+from config import prompts, openai_base_url
+from ratelimit import call_with_retry
+from instrument import span
+
+# the newsletter is split on this for the podcast, one TTS segment per section
+SECTION_BREAK = "\n\n\n\n"
+# make sure papers aren't too long for GPT-4o-mini's context window
+MAX_PAPER_CHARACTERS = 176000
+
+# PyPDF2, halo and pydub get imported inside the functions that use them so that importing this
+# module for the text helpers stays cheap
+
+def save_file(filepath, content):
+    with open(filepath, 'w', encoding='utf-8') as outfile:
+        outfile.write(content)
+
+def open_file(filepath):
+    with open(filepath, 'r', encoding='utf-8', errors='ignore') as infile:
+        return infile.read()
+
+def write_durably(filepath, content):
+    # write-then-rename with an fsync in between, so a crash leaves either the old file or the whole new one
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as outfile:
+        outfile.write(content)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(tmp_path, filepath)
+
+def make_client(key_file='key_openai.txt'):
+    from openai import OpenAI
+    # retries are left to ratelimit.py so they don't stack on top of the SDK's own
+    return OpenAI(api_key=open_file(key_file).strip(), base_url=openai_base_url, max_retries=0)
+
+def get_link(base_filename, links_file='links.txt'):
+    with open(links_file, 'r') as f:
+        for line in f:
+            title, link = line.strip().split(' | ')
+            if title.lower() in base_filename.lower():
+                return link
+    return None
+
+def intro_text(today):
+    return (f"Welcome to Tunadorable's weekly AI newsletter, where we summarize his favorite articles of the week that he plans to read."
+            f"\nThis article was written by gpt-4o-mini on {today}.")
+
+def outro_text():
+    return ("Thanks for reading/listening, that's all for this week."
+            "\nPlease consider checking out Tunadorable's youtube channel where he provides commentary on the above papers."
+            "\nhttps://youtube.com/@Tunadorable"
+            "\n\nHere is the most up-to-date version of the python scripts I currently use to create this newsletter:"
+            "\nhttps://github.com/evintunador/arxiv-summaries-workflow")
+
+def section_header(title, link):
+    return f"# {title}\n{link}"
+
+def extract_text(pdf_path):
+    """Returns the text of a pdf (cut down to fit the context window) or None if it can't be read"""
+    import PyPDF2
+    with span('pdf_extract') as s:
+        try:
+            with open(pdf_path, 'rb') as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                paper = ''
+                for page in pdf_reader.pages:
+                    try:
+                        paper += page.extract_text()
+                    except KeyError as e:
+                        print(f"Skipping page due to missing information: {e}")
+                        continue  # Skip the current iteration and move to the next page
+                s.add('pages', len(pdf_reader.pages))
+                s.add('bytes', os.path.getsize(pdf_path))
+        except PyPDF2.errors.PdfReadError:
+            print(f"Error reading file: {pdf_path}")
+            return None
+        s.add('characters', len(paper))
+    return paper[:MAX_PAPER_CHARACTERS]
+
+def chatbot(client, conversation, model="gpt-4o-mini", temperature=0.7, show_spinner=True, **kwargs):
+    # kwargs go straight to chat.completions.create, eg triage.py asks for response_format json
+    from halo import Halo
+    # rate limiting, backoff & Retry-After handling for transient errors all live in ratelimit.py
+    while True:
+        spinner = Halo(text='Thinking...', spinner='dots', enabled=show_spinner)
+        try:
+            spinner.start()
+            with span('llm', model=model) as s:
+                response = call_with_retry('openai_chat', client.chat.completions.create, model=model, messages=conversation, temperature=temperature, **kwargs)
+                s.add('tokens', getattr(getattr(response, 'usage', None), 'total_tokens', 0) or 0)
+            return response.choices[0].message.content#, response['usage']['total_tokens']
+        except Exception as oops:
+            print(f'\n\nError communicating with OpenAI: "{oops}"')
+            if 'maximum context length' in str(oops):
+                a = conversation.pop(0)
+                print('\n\nDEBUG: Trimming oldest message')
+                continue
+            raise
+        finally:
+            spinner.stop()
+
+def summarize(client, paper, show_spinner=True):
+    """Runs every prompt in config.prompts over the paper, returning the answers one per line"""
+    answers = []
+    ALL_MESSAGES = [{'role':'system', 'content': paper}]
+    for p in prompts:
+        ALL_MESSAGES.append({'role':'user', 'content': p})
+        answer = chatbot(client, ALL_MESSAGES, show_spinner=show_spinner)
+        ALL_MESSAGES.append({'role':'assistant', 'content': answer})
+        answers.append(answer)
+    return '\n'.join(answers)
+
+def speak(client, text, mp3_path):
+    with span('tts') as s:
+        response = call_with_retry('openai_tts', client.audio.speech.create,
+            model="tts-1",
+            voice="alloy",
+            input=text[:4096]
+        )
+        response.stream_to_file(mp3_path)
+        s.add('characters', len(text[:4096]))
+        s.add('bytes', os.path.getsize(mp3_path))
+
+def concat_audio(mp3_paths, output_path):
+    from pydub import AudioSegment
+    with span('audio_concat') as s:
+        full_audio = AudioSegment.from_mp3(mp3_paths[0])
+        for mp3_path in mp3_paths[1:]:
+            full_audio += AudioSegment.from_mp3(mp3_path)
+        full_audio.export(output_path, format="mp3")
+        s.add('segments', len(mp3_paths))
+        s.add('bytes', os.path.getsize(output_path))
+
+class Manifest:
+    """
+    The newsletter as one section file per paper (plus intro & outro) and a manifest.json that fixes their order.
+    Each section gets flushed to disk the moment its summary arrives, so a crash at paper 30 keeps papers 1-29,
+    and the podcast audio for a section can be made as soon as the section exists.
+    """
+    def __init__(self, sections_dir):
+        self.dir = sections_dir
+        self.path = os.path.join(sections_dir, 'manifest.json')
+        os.makedirs(sections_dir, exist_ok=True)
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = []
+
+    def set_order(self, ids_and_titles):
+        self.entries = [{'id': section_id, 'title': title} for section_id, title in ids_and_titles]
+        write_durably(self.path, json.dumps(self.entries, indent=1))
+
+    def section_path(self, section_id):
+        return os.path.join(self.dir, f"{section_id}.txt")
+
+    def audio_path(self, section_id):
+        return os.path.join(self.dir, f"{section_id}.mp3")
+
+    def has_section(self, section_id):
+        return os.path.isfile(self.section_path(section_id))
+
+    def write_section(self, section_id, text):
+        # audio made from different text (eg yesterday's intro with yesterday's date) has to be made again
+        if self.has_section(section_id) and self.read_section(section_id) != text and os.path.isfile(self.audio_path(section_id)):
+            os.remove(self.audio_path(section_id))
+        write_durably(self.section_path(section_id), text)
+
+    def read_section(self, section_id):
+        return open_file(self.section_path(section_id))
+
+    def newsletter_text(self):
+        """Every finished section, in manifest order"""
+        return SECTION_BREAK.join(self.read_section(e['id']) for e in self.entries if self.has_section(e['id']))
+
+    def audio_files(self):
+        return [self.audio_path(e['id']) for e in self.entries if os.path.isfile(self.audio_path(e['id']))]
+
+class SpeechWorker:
+    """
+    Background thread that turns sections into mp3 segments as they get submitted, so TTS runs while
+    the next paper is still being summarized instead of after all of them.
+    """
+    def __init__(self, client, manifest, speak_fn=None):
+        self.client = client
+        self.manifest = manifest
+        self.speak_fn = speak_fn or speak
+        self.queue = queue.Queue()
+        self.errors = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, section_id):
+        self.queue.put(section_id)
+
+    def _run(self):
+        while True:
+            section_id = self.queue.get()
+            if section_id is None:
+                return
+            audio_path = self.manifest.audio_path(section_id)
+            if os.path.isfile(audio_path):
+                continue
+            try:
+                # write to a temp name first so a half-written mp3 never looks finished
+                self.speak_fn(self.client, self.manifest.read_section(section_id), audio_path + '.part')
+                os.replace(audio_path + '.part', audio_path)
+            except Exception as e:
+                print(f"Couldn't make audio for {section_id} bc Error occurred: \n{e}")
+                self.errors.append((section_id, e))
+
+    def finish(self):
+        self.queue.put(None)
+        self.thread.join()
+        return self.errors
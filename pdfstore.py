@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import errno
+import shutil
+import hashlib
+import argparse
+import threading
+import instrument
+from dedup import split_arxiv_id
+from config import pdf_store_dir, pdf_link_modes
+
+def _id_filename(arxiv_id, version=None):
+    return arxiv_id + (f'v{version}' if version else '')
+
+def _tmp(path):
+    # unique per thread too, arxiv-search and the pipeline download on several threads at once
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(source, destination):
+    # copy-on-write clone: no bytes copied, and unlike a hardlink editing one side leaves the other alone
+    if sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(destination), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    if fcntl is None or not sys.platform.startswith('linux'):
+        # windows has no fcntl (and other unixes no FICLONE). As an OSError, place() just moves on to the next mode
+        raise OSError(errno.EOPNOTSUPP, f"reflinks aren't supported on {sys.platform}")
+    FICLONE = 0x40049409  # linux, btrfs/xfs/bcachefs
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            os.remove(destination)
+            raise
+
+LINKERS = {'reflink': _reflink, 'hardlink': os.link, 'copy': shutil.copyfile}
+# instrument counter for each mode
+LINK_COUNTERS = {'reflink': 'reflinks', 'hardlink': 'hardlinks', 'copy': 'copies'}
+
+class PdfStore:
+    """
+    Every pdf we've ever downloaded, once, under objects/<sha256>.pdf, with ids/<arxiv id>v<version> files
+    holding the hash of each paper version. pdfs/, pdfs-to-summarize/, the pipeline folder and the obsidian
+    vault get reflinks or hardlinks to these (copies only if neither works, eg across drives), so a paper
+    that's already in the store never gets downloaded or copied again.
+    """
+    def __init__(self, root=pdf_store_dir, link_modes=pdf_link_modes):
+        self.root = root
+        self.link_modes = link_modes
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'ids'), exist_ok=True)
+
+    def object_path(self, sha256):
+        return os.path.join(self.root, 'objects', f'{sha256}.pdf')
+
+    def _id_path(self, arxiv_id, version=None):
+        return os.path.join(self.root, 'ids', _id_filename(arxiv_id, version))
+
+    def _versions(self, arxiv_id):
+        prefix = _id_filename(arxiv_id)
+        versions = []
+        for name in os.listdir(os.path.join(self.root, 'ids')):
+            match = re.fullmatch(re.escape(prefix) + r'v(\d+)', name)
+            if match:
+                versions.append(int(match.group(1)))
+        return versions
+
+    def lookup(self, arxiv_id, version=None):
+        """
+        Path of the stored pdf for that paper version, or None. Without a version the newest one we have
+        counts (or whichever got downloaded without a version). A pdf whose bytes no longer match its hash
+        (a hardlinked copy got annotated, say) doesn't count either
+        """
+        if not arxiv_id:
+            return None
+        if version is None:
+            versions = self._versions(arxiv_id)
+            version = max(versions) if versions else None
+        id_path = self._id_path(arxiv_id, version)
+        try:
+            with open(id_path, 'r') as f:
+                sha256 = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = self.object_path(sha256)
+        if not os.path.isfile(path) or sha256_of(path) != sha256:
+            print(f"Stored pdf for {_id_filename(arxiv_id, version)} is missing or was modified, it'll be downloaded again")
+            for stale in (id_path, path):
+                if os.path.isfile(stale):
+                    os.remove(stale)
+            return None
+        return path
+
+    def _record(self, arxiv_id, version, sha256):
+        if not arxiv_id:
+            return
+        tmp_path = _tmp(self._id_path(arxiv_id, version))
+        with open(tmp_path, 'w') as f:
+            f.write(sha256)
+        os.replace(tmp_path, self._id_path(arxiv_id, version))
+
+    def add_bytes(self, content, arxiv_id=None, version=None):
+        sha256 = hashlib.sha256(content).hexdigest()
+        path = self.object_path(sha256)
+        if not os.path.isfile(path):
+            # write-then-rename so two downloads of the same paper at once can't leave a half written object
+            tmp_path = _tmp(path)
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        self._record(arxiv_id, version, sha256)
+        return path
+
+    def add_file(self, source, arxiv_id=None, version=None):
+        """Stores a pdf that's already on disk (eg one you dropped in pdfs-to-summarize/ by hand) without copying it if possible"""
+        sha256 = sha256_of(source)
+        path = self.object_path(sha256)
+        if not os.path.isfile(path):
+            self.place(source, path)
+        self._record(arxiv_id, version, sha256)
+        return path
+
+    def place(self, source, destination):
+        """Puts source at destination with the cheapest link that works. Returns which one that was"""
+        if os.path.exists(destination) and os.path.samefile(source, destination):
+            return 'same file'
+        tmp_path = _tmp(destination)
+        for mode in self.link_modes:
+            try:
+                LINKERS[mode](source, tmp_path)
+            except OSError:
+                continue
+            os.replace(tmp_path, destination)
+            instrument.add(LINK_COUNTERS[mode])
+            return mode
+        raise OSError(f"Couldn't put {source} at {destination} with any of {self.link_modes}")
+
+    def fetch(self, url, destination, download):
+        """
+        The pdf at url, placed at destination: from the store if we have that paper version, otherwise
+        download(url) -> bytes and stored first. Returns (bytes, whether it was a store hit)
+        """
+        arxiv_id, version = split_arxiv_id(url)
+        path = self.lookup(arxiv_id, version)
+        hit = path is not None
+        if not hit:
+            path = self.add_bytes(download(url), arxiv_id, version)
+        self.place(path, destination)
+        return os.path.getsize(path), hit
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="What's in the pdf store")
+    parser.add_argument('--verify', action='store_true', help='re-hash every stored pdf and report any that changed')
+    args = parser.parse_args(argv)
+
+    store = PdfStore()
+    objects = [name for name in os.listdir(os.path.join(store.root, 'objects')) if name.endswith('.pdf')]
+    ids = [name for name in os.listdir(os.path.join(store.root, 'ids')) if not name.endswith('.tmp')]
+    size = sum(os.path.getsize(store.object_path(name[:-4])) for name in objects)
+    print(f"{len(objects)} pdfs ({size / 1e6:.1f} MB) for {len(ids)} paper versions in {store.root}")
+    if args.verify:
+        bad = [name for name in objects if sha256_of(store.object_path(name[:-4])) != name[:-4]]
+        for name in bad:
+            print(f"modified since it was stored: {store.object_path(name[:-4])}")
+        print(f"{len(bad)} modified")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
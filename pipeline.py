@@ -0,0 +1,333 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from instrument import span
+from config import pipeline_dir, pipeline_queue_size, pipeline_workers, dry_run_latency
+
+# end-of-stream marker passed down the queues
+DONE = object()
+
+class Checkpoint:
+    """
+    Per-item progress (stage -> artifact path) saved after every stage so that a crash or ctrl-c
+    resumes mid-pipeline instead of re-downloading and re-summarizing everything.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+
+    def done(self, item_id, stage):
+        """The artifact a stage produced for this item last time, if it's still on disk"""
+        artifact = self.state.get(item_id, {}).get(stage)
+        return artifact if artifact and os.path.exists(artifact) else None
+
+    def mark(self, item_id, stage, value):
+        with self.lock:
+            item_state = self.state.setdefault(item_id, {})
+            item_state[stage] = value
+            if stage != 'failed':
+                # it got past whatever failed last time
+                item_state.pop('failed', None)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+class Services:
+    """The real thing: arXiv for pdfs, PyPDF2 for text, OpenAI for summaries and speech, pydub for the mp3"""
+    def __init__(self):
+        # heavy imports only happen when we're actually going to use them
+        import newsletter
+        import arxiv_api
+        self.newsletter = newsletter
+        self.arxiv_api = arxiv_api
+        self.client = newsletter.make_client()
+
+    def fetch(self, item, pdf_path):
+        self.arxiv_api.download_pdf(item['link'].replace('/abs/', '/pdf/'), pdf_path)
+
+    def extract(self, pdf_path):
+        return self.newsletter.extract_text(pdf_path)
+
+    def summarize(self, text):
+        return self.newsletter.summarize(self.client, text, show_spinner=False)
+
+    def speak(self, text, mp3_path):
+        self.newsletter.speak(self.client, text, mp3_path)
+
+    def concat(self, mp3_paths, output_path):
+        self.newsletter.concat_audio(mp3_paths, output_path)
+
+class DryRunServices:
+    """Local stand-ins for every external service, with a fake latency so the overlap between stages still shows"""
+    def __init__(self, latency=dry_run_latency):
+        self.latency = latency
+
+    def fetch(self, item, pdf_path):
+        time.sleep(self.latency)
+        with open(pdf_path, 'w', encoding='utf-8') as f:
+            f.write(f"%PDF-dry-run\n{item['title']}\n" + "This is placeholder paper text. " * 200)
+
+    def extract(self, pdf_path):
+        with open(pdf_path, 'r', encoding='utf-8') as f:
+            return f.read().split('\n', 1)[-1]
+
+    def summarize(self, text):
+        time.sleep(self.latency)
+        return "(dry run summary) " + ' '.join(text.split()[:40])
+
+    def speak(self, text, mp3_path):
+        time.sleep(self.latency)
+        with open(mp3_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def concat(self, mp3_paths, output_path):
+        with open(output_path, 'wb') as out:
+            for mp3_path in mp3_paths:
+                with open(mp3_path, 'rb') as f:
+                    out.write(f.read())
+
+def item_id(title, link):
+    match = re.search(r'arxiv\.org/(?:abs|pdf)/([^/\s]+?)(?:v\d+)?(?:\.pdf)?$', link or '')
+    if match:
+        return match.group(1)
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')[:80]
+
+def items_from_links(links_file):
+    items = []
+    with open(links_file, 'r') as f:
+        for line in f:
+            try:
+                title, link = line.strip().split(' | ')
+            except ValueError:
+                continue
+            items.append({'id': item_id(title, link), 'title': title, 'link': link})
+    return items
+
+def items_from_folder(folder, links_file='links.txt'):
+    items = []
+    for pdf_file in sorted(os.listdir(folder)):
+        if not pdf_file.endswith('.pdf'):
+            continue
+        title = pdf_file[:-4]
+        link = None
+        if os.path.isfile(links_file):
+            for other in items_from_links(links_file):
+                if other['title'].lower() in title.lower():
+                    link = other['link']
+                    break
+        items.append({'id': item_id(title, link), 'title': title, 'link': link, 'pdf': os.path.join(folder, pdf_file)})
+    return items
+
+def fake_items(n=5):
+    return [{'id': f'dry-run-{i}', 'title': f'Dry Run Paper {i}', 'link': f'https://arxiv.org/abs/0000.{i:05d}'} for i in range(n)]
+
+class Pipeline:
+    """
+    fetch -> extract -> summarize -> synthesize run as threads connected by bounded queues, so downloads,
+    text extraction, LLM calls and TTS all overlap. The bounded queues keep a fast stage from running
+    way ahead of a slow one. assemble() then stitches newsletter.txt and the podcast together in order.
+    """
+    def __init__(self, services, workdir, output_dir='.'):
+        self.services = services
+        self.workdir = workdir
+        self.output_dir = output_dir
+        for sub in ('pdfs', 'text'):
+            os.makedirs(os.path.join(workdir, sub), exist_ok=True)
+        # sections & their audio live in the same manifest-ordered layout newsletter-podcast.py uses
+        from newsletter import Manifest
+        self.manifest = Manifest(os.path.join(workdir, 'sections'))
+        self.checkpoint = Checkpoint(os.path.join(workdir, 'state.json'))
+        self.static_failures = {}  # the intro/outro aren't checkpointed, so their errors are kept here
+        self.stages = [
+            ('fetch', self.fetch),
+            ('extract', self.extract),
+            ('summarize', self.summarize),
+            ('synthesize', self.synthesize),
+        ]
+
+    def path(self, sub, item, extension):
+        return os.path.join(self.workdir, sub, f"{item['id']}{extension}")
+
+    # each stage takes an item, adds the artifact it made, and returns (artifact, item)
+    def fetch(self, item):
+        if item.get('pdf') or item.get('static'):
+            return item.get('pdf'), item
+        item['pdf'] = self.path('pdfs', item, '.pdf')
+        self.services.fetch(item, item['pdf'])
+        return item['pdf'], item
+
+    def extract(self, item):
+        if item.get('static'):
+            return None, item
+        text = self.services.extract(item['pdf'])
+        if text is None:
+            raise ValueError(f"couldn't read {item['pdf']}")
+        item['text'] = self.path('text', item, '.txt')
+        with open(item['text'], 'w', encoding='utf-8') as f:
+            f.write(text)
+        return item['text'], item
+
+    def summarize(self, item):
+        from newsletter import section_header
+        if item.get('static'):
+            section = item['static']
+        else:
+            with open(item['text'], 'r', encoding='utf-8') as f:
+                summary = self.services.summarize(f.read())
+            section = f"{section_header(item['title'], item['link'])}\n{summary}"
+        # flushed to disk before the item moves on, so the checkpoint never points at a half-written section
+        self.manifest.write_section(item['id'], section)
+        item['section'] = self.manifest.section_path(item['id'])
+        return item['section'], item
+
+    def synthesize(self, item):
+        item['audio'] = self.manifest.audio_path(item['id'])
+        self.services.speak(self.manifest.read_section(item['id']), item['audio'] + '.part')
+        os.replace(item['audio'] + '.part', item['audio'])
+        return item['audio'], item
+
+    def _run_stage(self, name, fn, inbox, outbox):
+        artifact_keys = {'fetch': 'pdf', 'extract': 'text', 'summarize': 'section', 'synthesize': 'audio'}
+
+        def worker():
+            while True:
+                item = inbox.get()
+                if item is DONE:
+                    inbox.put(DONE)  # let the other workers of this stage see it too
+                    return
+                # the intro/outro are rebuilt every run (they carry the date), so they're never checkpointed
+                artifact = None if item.get('static') else self.checkpoint.done(item['id'], name)
+                if artifact:
+                    with span(f'pipeline_{name}') as s:
+                        s.add('cache_hits')
+                    item[artifact_keys[name]] = artifact
+                else:
+                    try:
+                        with span(f'pipeline_{name}') as s:
+                            artifact, item = fn(item)
+                    except Exception as e:
+                        print(f"[{name}] {item['title']} failed, skipping it bc Error occurred: \n{e}")
+                        if item.get('static'):
+                            self.static_failures[item['id']] = f"{name}: {e}"
+                        else:
+                            self.checkpoint.mark(item['id'], 'failed', f"{name}: {e}")
+                        continue
+                    if artifact and not item.get('static'):
+                        self.checkpoint.mark(item['id'], name, artifact)
+                        print(f"[{name}] {item['title']}")
+                outbox.put(item)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(pipeline_workers.get(name, 1))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        outbox.put(DONE)
+
+    def run(self, items):
+        self.manifest.set_order([(item['id'], item['title']) for item in items])
+        queues = [queue.Queue(maxsize=pipeline_queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for (name, fn), inbox, outbox in zip(self.stages, queues, queues[1:]):
+            threads.append(threading.Thread(target=self._run_stage, args=(name, fn, inbox, outbox), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        def produce():
+            for item in items:
+                queues[0].put(item)
+            queues[0].put(DONE)
+        threading.Thread(target=produce, daemon=True).start()
+
+        finished = {}
+        while True:
+            item = queues[-1].get()
+            if item is DONE:
+                break
+            finished[item['id']] = item
+        for thread in threads:
+            thread.join()
+        return [finished[item['id']] for item in items if item['id'] in finished]
+
+    def failures(self, items, finished):
+        """(item, reason) for every item that didn't make it through synthesize this run"""
+        done = {item['id'] for item in finished}
+        return [(item, self.static_failures.get(item['id']) or self.checkpoint.state.get(item['id'], {}).get('failed', 'unknown'))
+                for item in items if item['id'] not in done]
+
+    def assemble(self, finished, failures=()):
+        """Writes newsletter.txt, and the podcast only if every section has its audio. Returns whether both got written"""
+        from newsletter import write_durably
+        # the manifest decides the order, no matter what order the items finished in
+        newsletter_path = os.path.join(self.output_dir, 'newsletter.txt')
+        write_durably(newsletter_path, self.manifest.newsletter_text())
+        if failures:
+            # a podcast that's silently missing papers is worse than none
+            print(f"Wrote {newsletter_path}, but {len(failures)} items didn't make it so there's no podcast this time:")
+            for item, reason in failures:
+                print(f"  {item['title']} ({reason})")
+            print("Run this again to retry them, everything that finished will be reused")
+            return False
+        audio_files = self.manifest.audio_files()
+        if not audio_files:
+            print(f"Wrote {newsletter_path}, but there's no audio to make a podcast from")
+            return False
+        podcast_path = os.path.join(self.output_dir, 'newsletter_podcast.mp3')
+        self.services.concat(audio_files, podcast_path)
+        print(f"Wrote {newsletter_path} and {podcast_path} ({len(finished) - 2} papers)")
+        return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run fetch -> extract -> summarize -> synthesize as one overlapping pipeline with checkpoints")
+    parser.add_argument('--links', default='links.txt', help='title | arxiv link lines to fetch and summarize (default links.txt)')
+    parser.add_argument('--from-folder', default=None, help='summarize the pdfs already in this folder (eg pdfs-to-summarize) instead of fetching links')
+    parser.add_argument('--dry-run', action='store_true', help='use local stand-ins for arXiv and OpenAI and write everything under the dry run folder')
+    parser.add_argument('--restart', action='store_true', help='throw away the checkpoints and start from scratch')
+    args = parser.parse_args(argv)
+
+    workdir = pipeline_dir + ('-dry-run' if args.dry_run else '')
+    if args.restart and os.path.isdir(workdir):
+        shutil.rmtree(workdir)
+    services = DryRunServices() if args.dry_run else Services()
+    output_dir = workdir if args.dry_run else '.'
+
+    if args.from_folder:
+        items = items_from_folder(args.from_folder, args.links)
+    elif args.dry_run and not os.path.isfile(args.links):
+        items = fake_items()
+    else:
+        items = items_from_links(args.links)
+    if not items:
+        print("Nothing to do")
+        return
+
+    from newsletter import intro_text, outro_text
+    today = datetime.now().strftime('%Y-%m-%d')
+    items = ([{'id': 'intro', 'title': 'Intro', 'link': None, 'static': intro_text(today)}] + items +
+             [{'id': 'outro', 'title': 'Outro', 'link': None, 'static': outro_text()}])
+
+    pipeline = Pipeline(services, workdir, output_dir)
+    start = time.time()
+    with span('pipeline_run') as s:
+        finished = pipeline.run(items)
+        complete = pipeline.assemble(finished, pipeline.failures(items, finished))
+        s.add('papers', len([item for item in finished if not item.get('static')]))
+    print(f"Pipeline finished in {time.time() - start:.1f} seconds")
+    if not complete:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,144 @@
+import os
+import re
+import csv
+from datetime import datetime, timedelta
+from config import profiles as profiles_config
+
+# Python function to read words from a text file and store each line as a string in a list.
+def read_lines_from_file(filename):
+    """
+    Read lines from a text file and store them as strings in a list.
+
+    Parameters:
+    - filename (str): The name of the text file to read from.
+
+    Returns:
+    - List[str]: A list containing each line from the text file as a string.
+    """
+    lines = []
+    try:
+        with open(filename, 'r') as file:
+            for line in file:
+                if line.strip():
+                    lines.append(line.strip())  # Remove leading/trailing whitespace
+    except FileNotFoundError:
+        print(f"File not found: {filename}.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+    return lines
+
+def init_csv(csv_file):
+    # Initialize CSV file with headers if it doesn't exist
+    if not os.path.isfile(csv_file):
+        with open(csv_file, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Title", "ArXiv Link", "Paper Date", "Date Added"])
+
+def _terms_regex(terms, stems=False):
+    # one compiled alternation per profile so matching a record against a profile is a single regex search.
+    # stems=True lets each word carry a suffix ("language model" matches "language modeling"), roughly like arXiv's stemming
+    if not terms:
+        return None
+    if stems:
+        words = [r'\w*\W+'.join(re.escape(word) for word in t.split()) for t in terms]
+        return re.compile(r'\b(?:' + '|'.join(words) + r')', re.IGNORECASE)
+    return re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in terms) + r')\b', re.IGNORECASE)
+
+class Profile:
+    """
+    One named search: its categories, include/exclude terms, most-recent-day watermark and csv files.
+    """
+    def __init__(self, name, categories, include_terms_file, exclude_terms_file, watermark_file, seen_csv, downloaded_csv):
+        self.name = name
+        self.categories_query = categories
+        self.categories = set(re.findall(r'cat:([\w.\-]+)', categories))
+        self.include_terms = read_lines_from_file(include_terms_file)
+        self.exclude_terms = read_lines_from_file(exclude_terms_file)
+        self.include_regex = _terms_regex(self.include_terms)
+        self.include_stems_regex = _terms_regex(self.include_terms, stems=True)
+        self.exclude_regex = _terms_regex(self.exclude_terms)
+        self.watermark_file = watermark_file
+        self.seen_csv = seen_csv
+        self.downloaded_csv = downloaded_csv
+        self.watermark = self.read_watermark()
+        self.reached_watermark = False
+
+    def init_csvs(self):
+        init_csv(self.seen_csv)
+        init_csv(self.downloaded_csv)
+
+    def read_watermark(self):
+        # Most Recent Days Checker. Sometimes arxiv posts papers w multiple dates on one day so we really just want to make sure we're checking whatever came out since we last queried
+        try:
+            with open(self.watermark_file, 'r') as file:
+                most_recent = file.read().strip()
+        except FileNotFoundError:
+            most_recent = ''
+        print(f'[{self.name}] most recent day searched: {most_recent}')
+        try:
+            return datetime.strptime(most_recent, '%Y-%m-%d').date()
+        except ValueError:
+            most_recent_check = datetime.now().date() - timedelta(days=2)
+            self.write_watermark(most_recent_check)
+            print(f"No date listed in {self.watermark_file}. Two days ago's date inserted, but arXiv frequently publishes papers with older dates on a given day (yes it's confusing) so you may want to edit the text file to an even earlier date. If today is a weekend then the script may return nothing.")
+            return most_recent_check
+
+    def write_watermark(self, date):
+        with open(self.watermark_file, 'w') as file:
+            file.write(date.strftime('%Y-%m-%d'))
+
+    def query(self):
+        include = ' OR '.join(f'all:"{term}"' for term in self.include_terms)
+        exclude = ' OR '.join(f'all:"{term}"' for term in self.exclude_terms)
+        if include and exclude:
+            return f'({self.categories_query}) AND ({include}) ANDNOT ({exclude})'
+        elif include:
+            return f'({self.categories_query}) AND ({include})'
+        elif exclude:
+            return f'({self.categories_query}) ANDNOT ({exclude})'
+        return self.categories_query
+
+    def matches(self, result, stems=False):
+        """
+        Local re-evaluation of this profile's query against a fetched result. arXiv's all: field also
+        stems words and searches author/comment fields, so this is a close approximation, not an exact one.
+        stems=True checks the include terms with suffixes allowed on every word
+        """
+        if self.categories and not self.categories.intersection(result.categories):
+            return False
+        text = f'{result.title}\n{result.summary}'
+        if self.exclude_regex and self.exclude_regex.search(text):
+            return False
+        include_regex = self.include_stems_regex if stems else self.include_regex
+        if include_regex and not include_regex.search(text):
+            return False
+        return True
+
+def load_profiles(names=None):
+    config = profiles_config if not names else {name: profiles_config[name] for name in names}
+    return [Profile(name, **settings) for name, settings in config.items()]
+
+def shared_query(profiles):
+    """One query whose results are the union of every profile's results"""
+    if len(profiles) == 1:
+        return profiles[0].query()
+    return ' OR '.join(f'({profile.query()})' for profile in profiles)
+
+def fan_out(result, profiles, restrict_to_most_recent=True):
+    """
+    Returns the profiles a fetched result belongs to. With a single profile the server already did
+    all the filtering. Otherwise if the local include check misses (stemming etc) we try again allowing
+    suffixes on the include terms' words. A result that still matches no profile gets dropped rather than
+    handed to profiles whose include terms have nothing to do with it.
+    """
+    published = result.published.date()
+    candidates = [p for p in profiles if not (restrict_to_most_recent and published <= p.watermark)]
+    if len(profiles) == 1:
+        return candidates
+    matched = [p for p in candidates if p.matches(result)]
+    if not matched:
+        matched = [p for p in candidates if p.matches(result, stems=True)]
+    if not matched and candidates:
+        print(f"No profile's terms match {result.title} locally, skipping it")
+    return matched
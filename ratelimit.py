@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import atexit
+import time
+import random
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+import instrument
+from config import rate_limits, retry_policy, ratelimit_state_file
+
+try:
+    import fcntl  # not on windows, where the limiter falls back to only coordinating threads within one script
+except ImportError:
+    fcntl = None
+
+# status codes worth waiting out. anything else (bad request, auth, context too long) gets raised right away
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+# exception class names that mean the request never really made it (requests/httpx/openai/arxiv all name them like this)
+TRANSIENT_ERROR_NAMES = ('Timeout', 'Connection', 'EmptyPage')
+
+# counters for this process, endpoint -> {'requests': n, 'throttles': n, 'retries': n, 'failures': n, 'waited': seconds}
+counters = {}
+# pipeline workers, the SpeechWorker and arxiv-search's download threads all count at once
+_counters_lock = threading.Lock()
+
+def count(endpoint, name, n=1):
+    with _counters_lock:
+        endpoint_counters = counters.setdefault(endpoint, {})
+        endpoint_counters[name] = endpoint_counters.get(name, 0) + n
+    # also count it on whatever stage span is open so the timing report shows where retries happened
+    instrument.add(name, n)
+
+def status_of(error):
+    for obj in (error, getattr(error, 'response', None)):
+        for attr in ('status_code', 'status'):
+            value = getattr(obj, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+def retry_after_of(error):
+    """Seconds the server asked us to wait via a Retry-After header, or None"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error):
+    status = status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # not every OSError: requests' exceptions all subclass it, including permanent ones like InvalidURL or
+    # TooManyRedirects, and so do local ones like PermissionError. Only dropped connections and timeouts count
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(name in type(error).__name__ for name in TRANSIENT_ERROR_NAMES)
+
+def backoff(attempt):
+    # "full jitter" exponential backoff so several scripts that got throttled together don't retry together
+    return random.uniform(0, min(retry_policy['max_delay'], retry_policy['base_delay'] * 2 ** attempt))
+
+class RateLimiter:
+    """
+    Token bucket per endpoint. The bucket state lives in a json file guarded by a lock file so every
+    script running at the same time draws from the same buckets instead of each thinking it has the
+    whole allowance to itself.
+    """
+    def __init__(self, state_file=ratelimit_state_file, limits=rate_limits):
+        self.state_file = state_file
+        self.lock_file = state_file + '.lock'
+        self.limits = limits
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        with self._thread_lock:
+            lock = open(self.lock_file, 'a')
+            try:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(self.state_file, 'r') as f:
+                        state = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    state = {}
+                yield state
+                tmp_file = f'{self.state_file}.{os.getpid()}.tmp'
+                with open(tmp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.state_file)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                lock.close()
+
+    def _bucket(self, state, endpoint, now):
+        limit = self.limits[endpoint]
+        bucket = state.setdefault('buckets', {}).setdefault(endpoint, {'tokens': limit['burst'], 'updated': now, 'blocked_until': 0})
+        elapsed = max(0.0, now - bucket['updated'])
+        bucket['tokens'] = min(limit['burst'], bucket['tokens'] + elapsed * limit['rate'])
+        bucket['updated'] = now
+        return bucket
+
+    def acquire(self, endpoint):
+        """Blocks until a request to this endpoint is allowed"""
+        waited = 0.0
+        while True:
+            with self._locked_state() as state:
+                now = time.time()
+                bucket = self._bucket(state, endpoint, now)
+                if bucket['blocked_until'] > now:
+                    wait = bucket['blocked_until'] - now
+                elif bucket['tokens'] >= 1:
+                    bucket['tokens'] -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - bucket['tokens']) / self.limits[endpoint]['rate']
+            if wait <= 0:
+                count(endpoint, 'requests')
+                if waited:
+                    count(endpoint, 'waited', waited)
+                return
+            # a little jitter so scripts waiting on the same bucket don't all wake up at once
+            wait += random.uniform(0, 0.05)
+            time.sleep(wait)
+            waited += wait
+
+    def throttle(self, endpoint, seconds):
+        """The server told us to back off, so empty the bucket and block everyone for a while"""
+        with self._locked_state() as state:
+            now = time.time()
+            bucket = self._bucket(state, endpoint, now)
+            bucket['tokens'] = 0
+            bucket['blocked_until'] = max(bucket['blocked_until'], now + seconds)
+
+    def flush_counters(self):
+        """Adds this process's counters to the running totals kept in the state file"""
+        with self._locked_state() as state:
+            totals = state.setdefault('counters', {})
+            with _counters_lock:
+                for endpoint, endpoint_counters in counters.items():
+                    endpoint_totals = totals.setdefault(endpoint, {})
+                    for name, n in endpoint_counters.items():
+                        endpoint_totals[name] = endpoint_totals.get(name, 0) + n
+                counters.clear()
+            return totals
+
+limiter = RateLimiter()
+
+def _flush_at_exit():
+    if counters:
+        try:
+            limiter.flush_counters()
+        except OSError as e:
+            print(f"Couldn't save rate limit counters bc Error occurred: \n{e}")
+
+atexit.register(_flush_at_exit)
+
+def call_with_retry(endpoint, fn, *args, **kwargs):
+    """
+    Calls fn(*args, **kwargs) once the endpoint's bucket allows it, retrying transient failures with
+    jittered exponential backoff (or however long a Retry-After header says). Non-retryable errors and
+    the last failure get raised so the caller can decide what to do.
+    """
+    max_retries = retry_policy['max_retries']
+    for attempt in range(max_retries + 1):
+        limiter.acquire(endpoint)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries:
+                count(endpoint, 'failures')
+                raise
+            retry_after = retry_after_of(e)
+            delay = retry_after if retry_after is not None else backoff(attempt)
+            if retry_after is not None or status_of(e) in THROTTLE_STATUSES:
+                count(endpoint, 'throttles')
+                limiter.throttle(endpoint, delay)
+            count(endpoint, 'retries')
+            print(f"{endpoint}: {type(e).__name__} ({e}), retry {attempt + 1}/{max_retries} in {delay:.1f} seconds")
+            time.sleep(delay)
+
+def main(argv=None):
+    totals = limiter.flush_counters()
+    if not totals:
+        print(f"No requests recorded in {ratelimit_state_file} yet")
+    for endpoint, endpoint_totals in sorted(totals.items()):
+        summary = ', '.join(f"{name}: {round(n, 1)}" for name, n in sorted(endpoint_totals.items()))
+        print(f"{endpoint} - {summary}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
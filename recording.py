@@ -1,10 +1,11 @@
 import webbrowser
 import time
 import re
-from pynput import keyboard
 import os
 from config import hotkey, replacements
 
+# pynput gets imported in main() so the helpers here can be imported without a display/keyboard hook
+
 # File paths
 links_file = 'links.txt'
 timestamps_file = 'timestamps.txt'
@@ -74,37 +75,49 @@ def on_activate():
     with open(timestamps_file, "w") as f:
         f.write("\n".join(timestamps))
 
-def on_press(key):
-    if key == keyboard.KeyCode.from_char(hotkey):
-        on_activate()
-    elif key == keyboard.Key.esc:
-        return False  # Stop listener
-
-# Read links from file
-with open(links_file, 'r') as file:
-    for line in file:
-        line = line.strip()
-        try:
-            title, link = line.split(' | ')
-            links.append((title, link))
-        except ValueError:
-            print(f"Invalid line format: {line}")
-
-#if links:
-#    print("Opening the first link(s)...")
-#    title, link = links[0]
-#    arxiv_id = extract_arxiv_id(link)
-#    open_links(arxiv_id, link)
-#    #current_link_index = 1  # Set to 1 so the next hotkey press will open the second link
-#else:
-if not links:
-    print("No links found in links.txt")
-
-print("The first link(s) will be opened and timer will be started when you first hit the hotkey.")
-print("Subsequent hotkey presses will record timestamps and open the next link(s).")
-print("Press ESC to exit the program.")
-
-with keyboard.Listener(on_press=on_press) as listener:
-    listener.join()
-
-print("Program ended.")
\ No newline at end of file
+def read_links(links_file):
+    # Read links from file
+    links = []
+    with open(links_file, 'r') as file:
+        for line in file:
+            line = line.strip()
+            try:
+                title, link = line.split(' | ')
+                links.append((title, link))
+            except ValueError:
+                print(f"Invalid line format: {line}")
+    return links
+
+def main():
+    from pynput import keyboard
+    global links
+
+    def on_press(key):
+        if key == keyboard.KeyCode.from_char(hotkey):
+            on_activate()
+        elif key == keyboard.Key.esc:
+            return False  # Stop listener
+
+    links = read_links(links_file)
+
+    #if links:
+    #    print("Opening the first link(s)...")
+    #    title, link = links[0]
+    #    arxiv_id = extract_arxiv_id(link)
+    #    open_links(arxiv_id, link)
+    #    #current_link_index = 1  # Set to 1 so the next hotkey press will open the second link
+    #else:
+    if not links:
+        print("No links found in links.txt")
+
+    print("The first link(s) will be opened and timer will be started when you first hit the hotkey.")
+    print("Subsequent hotkey presses will record timestamps and open the next link(s).")
+    print("Press ESC to exit the program.")
+
+    with keyboard.Listener(on_press=on_press) as listener:
+        listener.join()
+
+    print("Program ended.")
+
+if __name__ == "__main__":
+    main()
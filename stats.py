@@ -0,0 +1,319 @@
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import itertools
+from datetime import date, timedelta
+import numpy as np
+from config import stats_cache_dir, profiles as profiles_config
+from dedup import split_arxiv_id
+from profiles import read_lines_from_file, _terms_regex
+from instrument import span
+
+# days since 1970-01-01 for rows whose date is missing or unparseable
+NO_DAY = np.iinfo(np.int32).min
+EPOCH = date(1970, 1, 1)
+COLUMNS = ('paper_day', 'added_day', 'title', 'paper')
+# bytes before the end of what we've already parsed that have to still match, otherwise the csv was edited rather than appended to
+TAIL_BYTES = 256
+# rows parsed between writes to the column files
+BATCH_ROWS = 100000
+
+def to_day(text):
+    try:
+        return (date.fromisoformat(text.strip()) - EPOCH).days
+    except ValueError:
+        return NO_DAY
+
+def from_day(day):
+    return EPOCH + timedelta(days=int(day))
+
+def week_of(days):
+    # monday of each day's week. 1970-01-01 was a thursday
+    return days - (days + 3) % 7
+
+def _tail_hash(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - TAIL_BYTES))
+        return hashlib.sha1(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+def _append(path, values, dtype, keep):
+    # truncating to what meta.json knows about first means a crash between writes can't leave stray rows behind
+    with open(path, 'ab') as f:
+        f.truncate(keep * np.dtype(dtype).itemsize)
+        np.asarray(values, dtype=dtype).tofile(f)
+
+def _whole_lines(f, consumed):
+    # only whole lines, a row that's still being written gets picked up next time. consumed[0] counts the bytes handed out
+    for line in f:
+        if not line.endswith(b'\n'):
+            return
+        consumed[0] += len(line)
+        yield line.decode('utf-8', errors='replace')
+
+def _encode(dictionary, value, new_values):
+    values, codes = dictionary
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(values)
+        values.append(value)
+        new_values.append(value)
+    return code
+
+def _load(path, dtype, n):
+    if not n:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(n,))
+
+class LedgerCache:
+    """
+    The ledger csvs as int32 columns on disk (paper date & date added as day numbers, title and arXiv id as codes
+    into dictionaries shared by every ledger), memory-mapped on load. Ledgers only ever get rows appended, so
+    an update parses just the bytes after the last row we saw; anything else about the file changing rebuilds it.
+    """
+    def __init__(self, cache_dir=stats_cache_dir):
+        self.dir = cache_dir
+        os.makedirs(os.path.join(self.dir, 'terms'), exist_ok=True)
+        self.meta_path = os.path.join(self.dir, 'meta.json')
+        try:
+            with open(self.meta_path, 'r') as f:
+                self.meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.meta = {'titles': 0, 'titles_bytes': 0, 'papers': 0, 'papers_bytes': 0, 'ledgers': {}, 'terms': {}}
+        # the dictionaries are only read when there are new rows to encode or new titles to scan for a term
+        self._titles = None
+        self._papers = None
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _dictionary(self, kind):
+        cached = getattr(self, f'_{kind}')
+        if cached is not None:
+            return cached
+        values = []
+        if self.meta[kind]:
+            with open(self._path(f'{kind}.txt'), 'rb') as f:
+                values = f.read(self.meta[f'{kind}_bytes']).decode('utf-8').split('\n')[:self.meta[kind]]
+        cached = (values, {value: code for code, value in enumerate(values)})
+        setattr(self, f'_{kind}', cached)
+        return cached
+
+    def _append_dictionary(self, kind, new_values):
+        if not new_values:
+            return
+        data = ''.join(value + '\n' for value in new_values).encode('utf-8')
+        with open(self._path(f'{kind}.txt'), 'ab') as f:
+            f.truncate(self.meta[f'{kind}_bytes'])
+            f.write(data)
+        self.meta[kind] += len(new_values)
+        self.meta[f'{kind}_bytes'] += len(data)
+
+    def update(self, csv_file):
+        """Encodes whatever got appended to csv_file since last time. Returns the number of new rows"""
+        state = self.meta['ledgers'].get(csv_file)
+        size = os.path.getsize(csv_file) if os.path.isfile(csv_file) else 0
+        if state and state['offset'] and (size < state['offset'] or _tail_hash(csv_file, state['offset']) != state['tail']):
+            print(f"{csv_file} changed in the middle, rebuilding its cache")
+            state = None
+        if not state:
+            state = {'key': hashlib.sha1(csv_file.encode('utf-8')).hexdigest()[:12], 'offset': 0, 'rows': 0, 'tail': ''}
+        if size == state['offset']:
+            self.meta['ledgers'][csv_file] = state
+            return 0
+
+        titles, papers = self._dictionary('titles'), self._dictionary('papers')
+        # there are only a few hundred distinct dates, no point parsing the same one a thousand times
+        days = {}
+        consumed = [0]
+        n = 0
+        with open(csv_file, 'rb') as f:
+            f.seek(state['offset'])
+            rows = csv.reader(_whole_lines(f, consumed))
+            if state['offset'] == 0:
+                next(rows, None)  # header
+            while True:
+                # a batch at a time so a million row rebuild doesn't hold every row in memory at once
+                columns = {column: [] for column in COLUMNS}
+                new_titles, new_papers = [], []
+                for row in itertools.islice(rows, BATCH_ROWS):
+                    if len(row) < 2:
+                        continue
+                    row += [''] * (4 - len(row))
+                    # newlines would break the one-value-per-line dictionary files
+                    title = ' '.join(row[0].split())
+                    paper = split_arxiv_id(row[1].strip())[0] or row[1].strip()
+                    columns['title'].append(_encode(titles, title, new_titles))
+                    columns['paper'].append(_encode(papers, paper, new_papers))
+                    for column, text in (('paper_day', row[2]), ('added_day', row[3])):
+                        if text not in days:
+                            days[text] = to_day(text)
+                        columns[column].append(days[text])
+                if not columns['title']:
+                    break
+                self._append_dictionary('titles', new_titles)
+                self._append_dictionary('papers', new_papers)
+                for column, values in columns.items():
+                    _append(self._path(f"{state['key']}.{column}.i4"), values, '<i4', state['rows'] + n)
+                n += len(columns['title'])
+
+        state['rows'] += n
+        state['offset'] += consumed[0]
+        state['tail'] = _tail_hash(csv_file, state['offset'])
+        self.meta['ledgers'][csv_file] = state
+        self._save_meta()
+        return n
+
+    def columns(self, csv_file):
+        state = self.meta['ledgers'][csv_file]
+        return {column: _load(self._path(f"{state['key']}.{column}.i4"), '<i4', state['rows']) for column in COLUMNS}
+
+    def scan_terms(self, terms):
+        """Brings each term's list of matching title codes up to date. Only titles added since the last scan get looked at"""
+        for term in terms:
+            if term not in self.meta['terms']:
+                self.meta['terms'][term] = {'key': hashlib.sha1(term.encode('utf-8')).hexdigest()[:12], 'scanned': 0, 'hits': 0}
+        behind = [term for term in terms if self.meta['terms'][term]['scanned'] < self.meta['titles']]
+        if not behind:
+            return
+        titles, _ = self._dictionary('titles')
+        oldest = min(self.meta['terms'][term]['scanned'] for term in behind)
+        # lowercased once for all the terms
+        lowered = [title.lower() for title in titles[oldest:self.meta['titles']]]
+        for term in behind:
+            state = self.meta['terms'][term]
+            regex = _terms_regex([term])
+            needle = term.lower()
+            # plain substring check first, the regex only confirms word boundaries on the few titles that could match
+            hits = [code for code in range(state['scanned'], self.meta['titles'])
+                    if needle in lowered[code - oldest] and regex.search(titles[code])]
+            _append(self._term_path(state), hits, '<i4', state['hits'])
+            state['scanned'] = self.meta['titles']
+            state['hits'] += len(hits)
+        self._save_meta()
+
+    def _term_path(self, state):
+        return self._path(os.path.join('terms', f"{state['key']}.i4"))
+
+    def term_titles(self, term):
+        """Title codes whose title contains the term (whole words, any case), as of the last scan_terms"""
+        state = self.meta['terms'][term]
+        return _load(self._term_path(state), '<i4', state['hits'])
+
+### the aggregations. Everything below is whole-array numpy, no python loops over rows
+
+def counts_per(days, period, start, end):
+    """Rows per day or week (start has to be a monday for weeks) from start to end inclusive, as a dense array"""
+    # NO_DAY is below any start so it falls out with the range check
+    days = days[(days >= start) & (days <= end)]
+    counts = np.bincount(days - start, minlength=end - start + 1)
+    if period == 'week':
+        counts = counts.reshape(-1, 7).sum(axis=1)
+    return counts
+
+def membership(codes, n):
+    mask = np.zeros(n, dtype=bool)
+    mask[codes] = True
+    return mask
+
+def funnel(in_seen, in_downloaded, in_kept):
+    """Unique papers at each step, matched up by arXiv id"""
+    return {
+        'seen': int(np.count_nonzero(in_seen)),
+        'downloaded': int(np.count_nonzero(in_downloaded)),
+        'downloaded_of_seen': int(np.count_nonzero(in_seen & in_downloaded)),
+        'kept': int(np.count_nonzero(in_kept)),
+        'kept_of_downloaded': int(np.count_nonzero(in_downloaded & in_kept)),
+    }
+
+def title_papers(seen, n_titles):
+    """The paper each title code was seen as, -1 for titles that only show up in the other ledgers"""
+    papers = np.full(n_titles, -1, dtype=np.int32)
+    papers[seen['title']] = seen['paper']
+    return papers
+
+def term_hits(title_codes, papers_by_title, in_downloaded, in_kept):
+    """How many seen papers have the term in their title, and how many of those were downloaded/kept"""
+    papers = papers_by_title[title_codes]
+    papers = membership(papers[papers >= 0], len(in_downloaded))
+    return (int(np.count_nonzero(papers)), int(np.count_nonzero(papers & in_downloaded)),
+            int(np.count_nonzero(papers & in_kept)))
+
+def rate(numerator, denominator):
+    return f"{numerator / denominator:6.1%}" if denominator else '     -'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Counts per day/week, seen -> downloaded -> kept funnel and search term hit rates from the csv ledgers")
+    parser.add_argument('--profile', default=None, help=f"which profile's ledgers & search terms to use (default {next(iter(profiles_config))})")
+    parser.add_argument('--by', choices=['week', 'day'], default='week')
+    parser.add_argument('--last', type=int, default=12, help='how many days/weeks to show')
+    parser.add_argument('--kept-csv', default='papers_kept.csv')
+    parser.add_argument('--rebuild', action='store_true', help='throw away the cache and re-read the ledgers from scratch')
+    args = parser.parse_args(argv)
+
+    name = args.profile or next(iter(profiles_config))
+    profile = profiles_config[name]
+    ledgers = {'seen': profile['seen_csv'], 'downloaded': profile['downloaded_csv'], 'kept': args.kept_csv}
+    terms = [('include', t) for t in read_lines_from_file(profile['include_terms_file'])] + \
+            [('exclude', t) for t in read_lines_from_file(profile['exclude_terms_file'])]
+
+    if args.rebuild and os.path.isdir(stats_cache_dir):
+        shutil.rmtree(stats_cache_dir)
+    start = time.perf_counter()
+    cache = LedgerCache()
+    with span('stats_update') as s:
+        new_rows = sum(cache.update(csv_file) for csv_file in ledgers.values())
+        cache.scan_terms([term for _, term in terms])
+        term_codes = {term: cache.term_titles(term) for _, term in terms}
+        s.add('rows', new_rows)
+    columns = {step: cache.columns(csv_file) for step, csv_file in ledgers.items()}
+    loaded = time.perf_counter()
+
+    with span('stats_aggregate'):
+        seen, downloaded, kept = columns['seen'], columns['downloaded'], columns['kept']
+        n_titles, n_papers = cache.meta['titles'], cache.meta['papers']
+        latest = [int(c['added_day'].max()) for c in columns.values() if len(c['added_day'])]
+        end = max(latest) if latest and max(latest) != NO_DAY else (date.today() - EPOCH).days
+        step = 7 if args.by == 'week' else 1
+        end = int(week_of(end)) if args.by == 'week' else end
+        first = end - (args.last - 1) * step
+        per_period = {ledger: counts_per(c['added_day'], args.by, first, end + step - 1) for ledger, c in columns.items()}
+        in_seen, in_downloaded, in_kept = (membership(c['paper'], n_papers) for c in (seen, downloaded, kept))
+        totals = funnel(in_seen, in_downloaded, in_kept)
+        papers_by_title = title_papers(seen, n_titles)
+        hits = [(kind, term, *term_hits(term_codes[term], papers_by_title, in_downloaded, in_kept)) for kind, term in terms]
+    done = time.perf_counter()
+
+    print(f"[{name}] {len(seen['paper']):,} seen, {len(downloaded['paper']):,} downloaded, {len(kept['paper']):,} kept rows")
+    print(f"\nPer {args.by} (by date added):")
+    print(f"{'':<12}{'seen':>8}{'downl.':>8}{'kept':>8}{'downl.%':>9}{'kept%':>8}")
+    for i in range(args.last):
+        n_seen, n_down, n_kept = (int(per_period[ledger][i]) for ledger in ('seen', 'downloaded', 'kept'))
+        print(f"{from_day(first + i * step).isoformat():<12}{n_seen:>8}{n_down:>8}{n_kept:>8}  {rate(n_down, n_seen)}  {rate(n_kept, n_down)}")
+
+    print(f"\nFunnel (unique papers): {totals['seen']:,} seen -> {totals['downloaded_of_seen']:,} downloaded ({rate(totals['downloaded_of_seen'], totals['seen']).strip()})"
+          f" -> {totals['kept_of_downloaded']:,} kept ({rate(totals['kept_of_downloaded'], totals['downloaded']).strip()} of downloaded)")
+    if totals['downloaded'] != totals['downloaded_of_seen']:
+        print(f"  {totals['downloaded'] - totals['downloaded_of_seen']:,} downloaded papers aren't in {ledgers['seen']} (eg added with arxiv-link-downloader.py before it wrote there)")
+
+    if hits:
+        # the search terms only ever get matched against titles here, the ledgers don't keep abstracts
+        print(f"\nSearch terms in seen titles (exclude terms: papers seen before the term was added, that it would filter out now):")
+        print(f"{'':<9}{'term':<36}{'seen':>7}{'downl.':>8}{'kept':>6}{'downl.%':>9}{'kept%':>8}")
+        for kind, term, n_seen, n_down, n_kept in sorted(hits, key=lambda h: (h[0] != 'include', -h[2])):
+            print(f"{kind:<9}{term[:35]:<36}{n_seen:>7}{n_down:>8}{n_kept:>6}  {rate(n_down, n_seen)}  {rate(n_kept, n_down)}")
+
+    print(f"\n{new_rows:,} new rows cached, loaded in {(loaded - start) * 1000:.1f}ms, aggregated in {(done - loaded) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
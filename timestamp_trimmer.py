@@ -1,5 +1,6 @@
 import os
 from config import limit
+from instrument import span
 import argparse
 
 def calculate_total_characters(timestamps):
@@ -38,7 +39,9 @@ def main(timestamps_file):
 
     # Trim timestamps
     global limit
-    trimmed_timestamps = trim_timestamps(timestamps, limit)
+    with span('trim') as s:
+        trimmed_timestamps = trim_timestamps(timestamps, limit)
+        s.add('lines', len(timestamps))
 
     # Write trimmed timestamps to a new file
     with open(output_file, "w") as f:
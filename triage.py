@@ -0,0 +1,115 @@
+import os
+import re
+import json
+from config import triage_model, triage_batch_size, triage_batch_characters, triage_interests, triage_cache_file
+from instrument import span
+
+RELEVANCE = ('high', 'medium', 'low')
+# abstracts get cut to this so one rambling abstract can't crowd a batch
+MAX_ABSTRACT_CHARACTERS = 2000
+
+SYSTEM_PROMPT = """You triage new arXiv papers for a reader interested in: {interests}
+You get a list of papers. Each one starts with an id in square brackets, then its title, then its abstract.
+Answer with a JSON object {{"papers": [{{"id": "...", "tldr": "...", "relevance": "...", "tags": ["..."]}}]}} holding exactly one entry per paper, with the id copied exactly as given:
+- tldr: one plain sentence of at most 25 words on what the paper does and finds
+- relevance: "high", "medium" or "low" for this reader
+- tags: 1 to 3 short lowercase topic tags"""
+
+def load_cache(cache_file=triage_cache_file):
+    """arXiv id (no version) -> {'tldr', 'relevance', 'tags', 'model'}. Later lines win"""
+    cache = {}
+    if not os.path.isfile(cache_file):
+        return cache
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # a line cut off by a crash
+            cache[entry.pop('id')] = entry
+    return cache
+
+def append_cache(entries, cache_file=triage_cache_file):
+    # append-only like the csv ledgers, so a crash halfway through a run keeps every batch that finished
+    with open(cache_file, 'a', encoding='utf-8') as f:
+        for arxiv_id, entry in entries.items():
+            f.write(json.dumps({'id': arxiv_id, **entry}) + '\n')
+
+def batches(papers, size=triage_batch_size, max_characters=triage_batch_characters):
+    batch, characters = [], 0
+    for paper in papers:
+        length = len(paper['title']) + min(len(paper['abstract'] or ''), MAX_ABSTRACT_CHARACTERS)
+        if batch and (len(batch) >= size or characters + length > max_characters):
+            yield batch
+            batch, characters = [], 0
+        batch.append(paper)
+        characters += length
+    if batch:
+        yield batch
+
+def format_batch(batch):
+    """The user message for one request. Papers get short ids (p1, p2, ...) that are cheap and hard to garble"""
+    lines = []
+    for n, paper in enumerate(batch, start=1):
+        abstract = ' '.join((paper['abstract'] or '').split())[:MAX_ABSTRACT_CHARACTERS]
+        lines.append(f"[p{n}] {' '.join(paper['title'].split())}\n{abstract}")
+    return '\n\n'.join(lines)
+
+def parse_response(text, batch):
+    """arXiv id -> entry for every paper in the batch the model answered properly. Anything malformed is left out"""
+    try:
+        answer = json.loads(text)
+    except (TypeError, ValueError):
+        match = re.search(r'\{.*\}', text or '', re.DOTALL)
+        if not match:
+            return {}
+        try:
+            answer = json.loads(match.group(0))
+        except ValueError:
+            return {}
+    items = answer.get('papers', []) if isinstance(answer, dict) else answer
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        match = re.fullmatch(r'\[?p?(\d+)\]?', str(item.get('id', '')).strip())
+        if not match or not 1 <= int(match.group(1)) <= len(batch) or not item.get('tldr'):
+            continue
+        relevance = str(item.get('relevance', '')).lower()
+        tags = item.get('tags') if isinstance(item.get('tags'), list) else []
+        results[batch[int(match.group(1)) - 1]['id']] = {
+            'tldr': ' '.join(str(item['tldr']).split()),
+            'relevance': relevance if relevance in RELEVANCE else None,
+            'tags': [str(tag).lower() for tag in tags][:3],
+            'model': triage_model,
+        }
+    return results
+
+def triage(client, papers, cache_file=triage_cache_file, show_progress=True):
+    """
+    One-line TL;DRs, relevance and topic tags for papers ([{'id', 'title', 'abstract'}], ids without versions),
+    from the cache where we have them and otherwise from a few batched requests. Papers a batch comes back
+    without get one more try in a later batch. Returns arXiv id -> entry for every paper that has one
+    """
+    from newsletter import chatbot
+    cache = load_cache(cache_file)
+    pending = list({paper['id']: paper for paper in papers if paper['id'] not in cache}.values())
+    system = {'role': 'system', 'content': SYSTEM_PROMPT.format(interests=triage_interests)}
+    with span('triage') as s:
+        s.add('cache_hits', len(papers) - len(pending))
+        for attempt in range(2):
+            missed = []
+            for batch in batches(pending):
+                answer = chatbot(client, [system, {'role': 'user', 'content': format_batch(batch)}], model=triage_model,
+                                 temperature=0, show_spinner=False, response_format={'type': 'json_object'})
+                results = parse_response(answer, batch)
+                append_cache(results, cache_file)
+                cache.update(results)
+                missed += [paper for paper in batch if paper['id'] not in results]
+                s.add('papers', len(results))
+                if show_progress:
+                    print(f"Triaged {len(results)}/{len(batch)} abstracts in one request")
+            pending = missed
+        if pending:
+            print(f"{len(pending)} papers didn't get a triage summary, they'll be retried next time")
+    return {paper['id']: cache[paper['id']] for paper in papers if paper['id'] in cache}